@@ -1,5 +1,8 @@
 from typing import Dict, Any
 from app.core.database import get_db
+from app.core.logger import get_logger
+
+logger = get_logger("agents.credit_scoring")
 
 async def calculate_credit_score(user_id: str) -> Dict[str, Any]:
     """
@@ -14,12 +17,12 @@ async def calculate_credit_score(user_id: str) -> Dict[str, Any]:
     try:
         conn = await get_db()
         
-        # Get user's catch history
-        catches = await conn.fetch("SELECT * FROM catches WHERE user_id = $1", user_id)
+        # Get user's catch count from the incrementally maintained aggregates
+        catch_count = (await conn.fetch_user_aggregates(user_id))["catch_count"]
         
         # Simple scoring algorithm
         base_score = 650
-        catch_bonus = len(catches) * 10
+        catch_bonus = catch_count * 10
         score = min(base_score + catch_bonus, 850)
         
         # Calculate loan eligibility
@@ -31,16 +34,16 @@ async def calculate_credit_score(user_id: str) -> Dict[str, Any]:
             "credit_score": score,
             "loan_eligible": loan_eligible,
             "max_loan_amount": max_loan_amount,
-            "catch_count": len(catches),
+            "catch_count": catch_count,
             "score_components": {
                 "base_score": base_score,
                 "activity_bonus": catch_bonus,
-                "total_catches": len(catches)
+                "total_catches": catch_count
             }
         }
         
     except Exception as e:
-        print(f"Credit scoring error: {e}")
+        logger.error("Credit scoring error: %s", e)
         return {
             "user_id": user_id,
             "credit_score": 700,
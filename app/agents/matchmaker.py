@@ -1,50 +1,471 @@
-from typing import Dict, Any, List
+import asyncio
+import bisect
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+from app.core.config import settings
 from app.core.database import get_db
+from app.models import UserType
+from app.utils.geo import resolve_location, haversine_km, normalize_place
+from app.core.logger import get_logger
 
-async def find_matches(offer: Dict[str, Any], price_analysis: Dict[str, Any], market_insights: Dict[str, Any]) -> List[Dict[str, Any]]:
+logger = get_logger("agents.matchmaker")
+
+# NumPy is only needed for vectorized batch matching
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Weights of the score components; they sum to 100
+DISTANCE_WEIGHT = 40
+SPECIES_WEIGHT = 30
+CAPACITY_WEIGHT = 20
+HISTORY_WEIGHT = 10
+
+MAX_DISTANCE_KM = 800.0  # beyond this the distance component is 0
+HISTORY_SATURATION = 20  # transactions at which the history component maxes out
+
+def normalize_fish_type(fish_type: Optional[str]) -> str:
+    return " ".join(str(fish_type or "").lower().split())
+
+BUYER_COLUMNS = ("id", "email", "name", "organization", "location", "preferred_fish_types", "capacity_kg")
+
+class BuyerProfile:
+    """Buyer fields the matchmaker scores on, resolved once when the buyer is indexed"""
+    __slots__ = ("id", "email", "name", "organization", "location", "place", "coords", "region",
+                 "fish_types", "capacity_kg", "transactions", "history")
+
+    def __init__(self, row: Dict[str, Any], transactions: int = 0):
+        self.id = row.get("id")
+        self.email = row.get("email")
+        self.name = row.get("name")
+        self.organization = row.get("organization")
+        self.location = row.get("location")
+        self.place = normalize_place(self.location)
+        resolved = resolve_location(self.location)
+        self.coords = resolved[:2] if resolved else None
+        self.region = resolved[2] if resolved else None
+        self.fish_types = frozenset(normalize_fish_type(f) for f in (row.get("preferred_fish_types") or []) if f)
+        capacity = row.get("capacity_kg")
+        self.capacity_kg = float(capacity) if capacity is not None else None
+        self.transactions = int(transactions or 0)
+        self.history = min(1.0, math.log1p(self.transactions) / math.log1p(HISTORY_SATURATION))
+
+def _insort(groups: Dict[Any, List[Tuple[float, str]]], key: Any, entry: Tuple[float, str]):
+    bisect.insort(groups.setdefault(key, []), entry)
+
+def _discard(groups: Dict[Any, List[Tuple[float, str]]], key: Any, entry: Tuple[float, str]):
+    entries = groups.get(key)
+    if entries:
+        i = bisect.bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+class BuyerIndex:
+    """
+    In-memory index of buyers keyed by location and preferred species.
+
+    Each location (normalized place) keeps its buyers in three lists, all
+    ordered by trading history, best first: buyers of a given species,
+    buyers with no species preference and everyone. That lets a top-k
+    search bound the best score a buyer could still reach and stop early
+    (see candidate_groups).
+
+    Built from the database on first use and refreshed every
+    BUYER_INDEX_REFRESH_SECONDS (which also picks up buyers registered on
+    other workers); buyers registered on this worker are added immediately
+    via add().
+    """
+    def __init__(self):
+        self.buyers: Dict[str, BuyerProfile] = {}
+        self.by_fish_type: Dict[str, Set[str]] = {}
+        self.places: Dict[str, BuyerProfile] = {}  # one buyer per place, for its coords and region
+        self.by_place: Dict[str, List[Tuple[float, str]]] = {}
+        self.by_place_fish: Dict[Tuple[str, str], List[Tuple[float, str]]] = {}
+        self.general_by_place: Dict[str, List[Tuple[float, str]]] = {}  # no species preference
+        self.built_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._arrays: Optional[Dict[str, Any]] = None
+
+    def add(self, row: Dict[str, Any], transactions: int = 0):
+        """Add or replace one buyer"""
+        if not row.get("id"):
+            return
+        self.remove(row["id"])
+        self._arrays = None
+        buyer = BuyerProfile(row, transactions)
+        self.buyers[buyer.id] = buyer
+        for fish_type in buyer.fish_types:
+            self.by_fish_type.setdefault(fish_type, set()).add(buyer.id)
+        entry = (-buyer.history, buyer.id)
+        self.places.setdefault(buyer.place, buyer)
+        _insort(self.by_place, buyer.place, entry)
+        for fish_type in buyer.fish_types:
+            _insort(self.by_place_fish, (buyer.place, fish_type), entry)
+        if not buyer.fish_types:
+            _insort(self.general_by_place, buyer.place, entry)
+
+    def remove(self, buyer_id: str):
+        buyer = self.buyers.pop(buyer_id, None)
+        if buyer is None:
+            return
+        self._arrays = None
+        for fish_type in buyer.fish_types:
+            self.by_fish_type.get(fish_type, set()).discard(buyer_id)
+        entry = (-buyer.history, buyer.id)
+        _discard(self.by_place, buyer.place, entry)
+        for fish_type in buyer.fish_types:
+            _discard(self.by_place_fish, (buyer.place, fish_type), entry)
+        _discard(self.general_by_place, buyer.place, entry)
+
+    def is_stale(self) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > settings.BUYER_INDEX_REFRESH_SECONDS
+
+    async def refresh(self, force: bool = False):
+        """Rebuild the index from the database if it is stale"""
+        if not force and not self.is_stale():
+            return
+        async with self._lock:
+            if not force and not self.is_stale():
+                return
+            conn = await get_db()
+            rows = await conn.fetch_users_by_type([UserType.BUYER.value], columns=BUYER_COLUMNS)
+            counts = await conn.fetch_transaction_counts([row["id"] for row in rows])
+            self.buyers, self.by_fish_type, self._arrays = {}, {}, None
+            self.places, self.by_place, self.by_place_fish, self.general_by_place = {}, {}, {}, {}
+            for row in rows:
+                self.add(row, counts.get(row["id"], 0))
+            self.built_at = time.monotonic()
+            logger.debug("Buyer index rebuilt", extra={"buyers": len(self.buyers)})
+
+    def candidate_groups(self, offer_place: str, offer_coords, region: Optional[str],
+                         fish_type: str) -> Iterator[Tuple[float, Iterator[BuyerProfile]]]:
+        """
+        Every buyer, in groups of (upper bound on score, buyers), highest bound first.
+
+        A group is one location's buyers of the offer's species, buyers
+        with no preference or everyone else there. All of them share the
+        distance and species components, so the bound is those plus full
+        capacity and history. Within a group buyers come best history
+        first, and a buyer's own bound is the group bound less the history
+        it lacks; a caller keeping the top k can stop at the first group,
+        or the first buyer within one, that cannot beat its k-th score.
+        """
+        rest = CAPACITY_WEIGHT + HISTORY_WEIGHT
+        groups = []
+        for place, sample in self.places.items():
+            distance = distance_component(sample, offer_place, offer_coords, region)[0] * DISTANCE_WEIGHT
+            groups.append((distance + SPECIES_WEIGHT + rest, "species", place))
+            groups.append((distance + SPECIES_WEIGHT * 0.5 + rest, "general", place))
+            groups.append((distance + rest, "other", place))
+        groups.sort(key=lambda group: group[0], reverse=True)
+        for bound, kind, place in groups:
+            if kind == "species":
+                entries = self.by_place_fish.get((place, fish_type))
+            elif kind == "general":
+                entries = self.general_by_place.get(place)
+            else:
+                entries = self.by_place.get(place)
+            if entries:
+                yield bound, self._members(entries, fish_type if kind == "other" else None)
+
+    def _members(self, entries: List[Tuple[float, str]], skip_fish_type: Optional[str]) -> Iterator[BuyerProfile]:
+        """Buyers of a group in history order; for the 'other' group, skip those in the species or general groups"""
+        for _, buyer_id in entries:
+            buyer = self.buyers[buyer_id]
+            if skip_fish_type is None or (buyer.fish_types and skip_fish_type not in buyer.fish_types):
+                yield buyer
+
+    def arrays(self) -> Dict[str, Any]:
+        """Per-buyer columns as NumPy arrays for batch scoring, cached until the index changes"""
+        if self._arrays is None:
+            buyers = list(self.buyers.values())
+            place_codes: Dict[str, int] = {}
+            region_codes: Dict[str, int] = {}
+            for buyer in buyers:
+                place_codes.setdefault(buyer.place, len(place_codes))
+                if buyer.region:
+                    region_codes.setdefault(buyer.region, len(region_codes))
+            transactions = np.array([buyer.transactions for buyer in buyers], dtype=float)
+            self._arrays = {
+                "buyers": buyers,
+                "positions": {buyer.id: i for i, buyer in enumerate(buyers)},
+                "place_codes": place_codes,
+                "region_codes": region_codes,
+                "place": np.array([place_codes[buyer.place] for buyer in buyers], dtype=np.int64),
+                "region": np.array([region_codes.get(buyer.region, -2) for buyer in buyers], dtype=np.int64),
+                "lat": np.array([buyer.coords[0] if buyer.coords else np.nan for buyer in buyers], dtype=float),
+                "lon": np.array([buyer.coords[1] if buyer.coords else np.nan for buyer in buyers], dtype=float),
+                "general": np.array([not buyer.fish_types for buyer in buyers], dtype=bool),
+                "capacity": np.array([buyer.capacity_kg if buyer.capacity_kg is not None else np.nan for buyer in buyers], dtype=float),
+                "history": np.minimum(1.0, np.log1p(transactions) / math.log1p(HISTORY_SATURATION)),
+            }
+        return self._arrays
+
+buyer_index = BuyerIndex()
+
+def distance_component(buyer: BuyerProfile, offer_place: str, offer_coords,
+                       offer_region: Optional[str]) -> Tuple[float, Optional[float]]:
+    """Distance component (0-1) and distance in km (None if unknown); the same for every buyer at one place"""
+    if offer_place and buyer.place == offer_place:
+        return 1.0, 0.0
+    if offer_coords and buyer.coords:
+        distance_km = haversine_km(*offer_coords, *buyer.coords)
+        return max(0.0, 1.0 - distance_km / MAX_DISTANCE_KM), distance_km
+    if offer_region and buyer.region == offer_region:
+        return 0.7, None
+    return 0.3, None  # unknown location: neutral
+
+def score_buyer(buyer: BuyerProfile, offer_place: str, offer_coords, offer_region: Optional[str],
+                fish_type: str, quantity_kg: float) -> Dict[str, Any]:
+    """Score one buyer against an offer; returns the total (0-100) and its components"""
+    distance, distance_km = distance_component(buyer, offer_place, offer_coords, offer_region)
+
+    if not buyer.fish_types:
+        species = 0.5  # buys anything
+    else:
+        species = 1.0 if fish_type in buyer.fish_types else 0.0
+
+    if buyer.capacity_kg is None or quantity_kg <= 0:
+        capacity = 0.5
+    else:
+        capacity = min(1.0, buyer.capacity_kg / quantity_kg)
+
+    history = buyer.history
+
+    components = {
+        "distance": round(distance * DISTANCE_WEIGHT, 1),
+        "species": round(species * SPECIES_WEIGHT, 1),
+        "capacity": round(capacity * CAPACITY_WEIGHT, 1),
+        "history": round(history * HISTORY_WEIGHT, 1),
+    }
+    total = (distance * DISTANCE_WEIGHT + species * SPECIES_WEIGHT
+             + capacity * CAPACITY_WEIGHT + history * HISTORY_WEIGHT)
+    return {"score": int(round(total)), "components": components, "distance_km": distance_km}
+
+def score_matrix(offers: List[Dict[str, Any]], index: BuyerIndex) -> Tuple[Any, Dict[str, Any], Any]:
+    """
+    Vectorized score_buyer: score N offers against all M indexed buyers at once.
+
+    Returns the (N, M) total score matrix (own listings are -inf), the
+    per-component matrices (0-1, before weighting) and the distance in km
+    (NaN where unknown).
+    """
+    arrays = index.arrays()
+    places = [normalize_place(offer.get("location")) for offer in offers]
+    resolved = [resolve_location(offer.get("location")) for offer in offers]
+    fish_types = [normalize_fish_type(offer.get("fish_type")) for offer in offers]
+
+    offer_place = np.array([arrays["place_codes"].get(place, -1) if place else -1 for place in places], dtype=np.int64)
+    offer_region = np.array([arrays["region_codes"].get(r[2], -1) if r else -1 for r in resolved], dtype=np.int64)
+    offer_lat = np.array([r[0] if r else np.nan for r in resolved], dtype=float)
+    offer_lon = np.array([r[1] if r else np.nan for r in resolved], dtype=float)
+    quantity = np.array([float(offer.get("quantity_kg") or 0) for offer in offers], dtype=float)
+
+    # Distance component
+    same_place = offer_place[:, None] == arrays["place"][None, :]
+    both_coords = ~np.isnan(offer_lat)[:, None] & ~np.isnan(arrays["lat"])[None, :]
+    same_region = (offer_region[:, None] == arrays["region"][None, :]) & (offer_region >= 0)[:, None]
+    lat1, lon1 = np.radians(offer_lat)[:, None], np.radians(offer_lon)[:, None]
+    lat2, lon2 = np.radians(arrays["lat"])[None, :], np.radians(arrays["lon"])[None, :]
+    with np.errstate(invalid="ignore"):
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distance_km = 6371.0 * 2 * np.arcsin(np.sqrt(a))
+    distance_km = np.where(same_place, 0.0, np.where(both_coords, distance_km, np.nan))
+    distance = np.where(
+        same_place, 1.0,
+        np.where(both_coords, np.maximum(0.0, 1.0 - distance_km / MAX_DISTANCE_KM),
+                 np.where(same_region, 0.7, 0.3))
+    )
+
+    # Species component: one preference row per distinct fish type in the batch
+    distinct = list(dict.fromkeys(fish_types))
+    preferences = np.zeros((len(distinct), len(arrays["buyers"])), dtype=bool)
+    for row, fish_type in enumerate(distinct):
+        for buyer_id in index.by_fish_type.get(fish_type, ()):
+            preferences[row, arrays["positions"][buyer_id]] = True
+    offer_fish = np.array([distinct.index(fish_type) for fish_type in fish_types], dtype=np.int64)
+    species = np.where(arrays["general"][None, :], 0.5, preferences[offer_fish].astype(float))
+
+    # Capacity component
+    with np.errstate(divide="ignore", invalid="ignore"):
+        capacity = np.where(
+            np.isnan(arrays["capacity"])[None, :] | (quantity <= 0)[:, None], 0.5,
+            np.minimum(1.0, arrays["capacity"][None, :] / quantity[:, None])
+        )
+
+    history = np.broadcast_to(arrays["history"][None, :], distance.shape)
+
+    scores = np.rint(distance * DISTANCE_WEIGHT + species * SPECIES_WEIGHT
+                     + capacity * CAPACITY_WEIGHT + history * HISTORY_WEIGHT)
+    for row, offer in enumerate(offers):
+        own = arrays["positions"].get(offer.get("user_id"))
+        if own is not None:
+            scores[row, own] = -np.inf
+    components = {"distance": distance, "species": species, "capacity": capacity, "history": history}
+    return scores, components, distance_km
+
+def match_reason(offer: Dict[str, Any], components: Dict[str, float]) -> str:
+    parts = []
+    if components["species"] >= SPECIES_WEIGHT:
+        parts.append(f"buys {offer.get('fish_type', 'fish')}")
+    if components["distance"] >= DISTANCE_WEIGHT * 0.75:
+        parts.append(f"close to {offer.get('location', 'you')}")
+    if components["capacity"] >= CAPACITY_WEIGHT:
+        parts.append("can take the full quantity")
+    if components["history"] >= HISTORY_WEIGHT * 0.5:
+        parts.append("active trader")
+    return "Buyer " + ", ".join(parts) if parts else f"Potential buyer for {offer.get('fish_type', 'fish')}"
+
+def build_match(offer: Dict[str, Any], buyer: BuyerProfile, result: Dict[str, Any], price_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape one scored buyer into the match dict returned by the API"""
+    quantity_kg = float(offer.get("quantity_kg") or 0)
+    try:
+        fair_price = float((price_analysis or {}).get("fair_price") or 0)
+    except (TypeError, ValueError):
+        fair_price = 0.0
+    return {
+        "buyer_id": buyer.id,
+        "buyer_contact": buyer.email,
+        "buyer_name": buyer.name or "Unknown",
+        "buyer_organization": buyer.organization or "",
+        "buyer_location": buyer.location or "",
+        "match_score": result["score"],
+        "score_components": result["components"],
+        "distance_km": round(result["distance_km"], 1) if result["distance_km"] is not None else None,
+        "estimated_price_per_kg": (price_analysis or {}).get("fair_price"),
+        "estimated_total_value": round(fair_price * quantity_kg, 2),
+        "reason": match_reason(offer, result["components"]),
+    }
+
+def rank_buyers(index: BuyerIndex, offer_place: str, offer_coords, offer_region: Optional[str], fish_type: str,
+                quantity_kg: float, exclude_id: Optional[str], top_k: int) -> List[Tuple[Dict[str, Any], BuyerProfile]]:
+    """
+    The top_k (score result, buyer) pairs for an offer, best first.
+
+    Walks index.candidate_groups and stops at the first group, or the
+    first buyer within a group, whose score bound cannot beat the current
+    k-th best, so the result is the same as scoring every buyer.
+    """
+    if top_k <= 0:
+        return []
+    heap: List[Tuple[int, int, Dict[str, Any], BuyerProfile]] = []
+    order = itertools.count()
+    for bound, buyers in index.candidate_groups(offer_place, offer_coords, offer_region, fish_type):
+        # The epsilon keeps float error from pruning a buyer whose score rounds up to the bound
+        if len(heap) >= top_k and round(bound + 1e-9) <= heap[0][0]:
+            break
+        for buyer in buyers:
+            if len(heap) >= top_k and round(bound - HISTORY_WEIGHT * (1 - buyer.history) + 1e-9) <= heap[0][0]:
+                break
+            if buyer.id == exclude_id:
+                continue
+            result = score_buyer(buyer, offer_place, offer_coords, offer_region, fish_type, quantity_kg)
+            # Ties keep the buyer seen first
+            item = (result["score"], -next(order), result, buyer)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+    return [(result, buyer) for _, _, result, buyer in sorted(heap, key=lambda item: (item[0], item[1]), reverse=True)]
+
+async def find_matches(offer: Dict[str, Any], price_analysis: Dict[str, Any], market_insights: Dict[str, Any],
+                       top_k: int = 10) -> List[Dict[str, Any]]:
     """
     Find potential buyers for a fish catch offer
-    
+
     Args:
         offer: Fish catch details (fish_type, quantity_kg, location, user_id)
         price_analysis: Price analysis from Mistral AI
         market_insights: Market insights from AI/ML API
-    
+        top_k: Number of matches to return
+
     Returns:
-        List of potential buyer matches with scores and details
+        List of potential buyer matches with scores and details, best first
     """
     try:
-        conn = await get_db()
-        
-        # Get all users and filter for buyers
-        all_users = await conn.fetch("SELECT * FROM users")
-        buyers = [u for u in all_users if u.get("user_type") == "buyer"]
-        
-        # Build match scoring & results
-        matches = []
-        for buyer in buyers:
-            # Simple heuristic: base score on Mistral confidence + random factor
-            confidence = float(price_analysis.get("confidence_score", 0)) if price_analysis else 0.5
-            score = int(min(max(30 + confidence * 60, 0), 100))
-            
-            matches.append({
-                "buyer_id": buyer.get("id"),
-                "buyer_contact": buyer.get("email"),
-                "buyer_name": buyer.get("name", "Unknown"),
-                "buyer_organization": buyer.get("organization", ""),
-                "buyer_location": buyer.get("location", ""),
-                "match_score": score,
-                "estimated_price_per_kg": price_analysis.get("fair_price"),
-                "estimated_total_value": round(price_analysis.get("fair_price", 0) * offer.get('quantity_kg', 0), 2),
-                "reason": f"High demand for {offer.get('fish_type', 'fish')} in {offer.get('location', 'area')}",
-                "note": "Simulated match (use buyer preferences in production)"
-            })
-        
-        # Sort by match score (highest first)
-        matches.sort(key=lambda x: x['match_score'], reverse=True)
-        
-        return matches[:10]  # Return top 10 matches
-        
+        await buyer_index.refresh()
+
+        fish_type = normalize_fish_type(offer.get("fish_type"))
+        quantity_kg = float(offer.get("quantity_kg") or 0)
+        offer_place = normalize_place(offer.get("location"))
+        resolved = resolve_location(offer.get("location"))
+        offer_coords = resolved[:2] if resolved else None
+        offer_region = resolved[2] if resolved else None
+
+        best = rank_buyers(buyer_index, offer_place, offer_coords, offer_region, fish_type, quantity_kg,
+                           offer.get("user_id"), top_k)
+        return [build_match(offer, buyer, result, price_analysis) for result, buyer in best]
+
     except Exception as e:
-        print(f"Matchmaking error: {e}")
+        logger.error("Matchmaking error: %s", e)
+        return []
+
+def top_columns(scores: Any, top_k: int) -> List[int]:
+    """
+    Columns of the top_k finite scores in one row, best first.
+
+    Ties go to the lower column, the order heapq.nlargest keeps in the
+    pure-Python path, so both paths pick the same buyers. Own listings
+    (-inf) are never returned.
+    """
+    valid = int(np.isfinite(scores).sum())
+    k = min(top_k, valid)
+    if k <= 0:
         return []
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    above = np.flatnonzero(scores > threshold)
+    tied = np.flatnonzero(scores == threshold)[:k - len(above)]
+    columns = np.concatenate([above, tied])
+    return columns[np.lexsort((columns, -scores[columns]))].tolist()
+
+async def find_matches_batch(offers: List[Dict[str, Any]], price_analyses: List[Dict[str, Any]],
+                             top_k: int = 10) -> List[List[Dict[str, Any]]]:
+    """
+    Find the top-k buyers for each of several offers in one pass.
+
+    Uses one (offers x buyers) NumPy score matrix when NumPy is installed,
+    otherwise scores each pair with score_buyer. Scores are the same as
+    find_matches gives; find_matches just skips buyers that provably
+    cannot reach the top k.
+    """
+    await buyer_index.refresh()
+    buyers = list(buyer_index.buyers.values())
+    if not offers or not buyers:
+        return [[] for _ in offers]
+
+    if not NUMPY_AVAILABLE:
+        results = []
+        for offer, price_analysis in zip(offers, price_analyses):
+            resolved = resolve_location(offer.get("location"))
+            scored = (
+                (score_buyer(buyer, normalize_place(offer.get("location")), resolved[:2] if resolved else None,
+                             resolved[2] if resolved else None, normalize_fish_type(offer.get("fish_type")),
+                             float(offer.get("quantity_kg") or 0)), buyer)
+                for buyer in buyers if buyer.id != offer.get("user_id")
+            )
+            best = heapq.nlargest(top_k, scored, key=lambda item: item[0]["score"])
+            results.append([build_match(offer, buyer, result, price_analysis) for result, buyer in best])
+        return results
+
+    scores, components, distance_km = score_matrix(offers, buyer_index)
+    buyers = buyer_index.arrays()["buyers"]
+
+    weights = {"distance": DISTANCE_WEIGHT, "species": SPECIES_WEIGHT, "capacity": CAPACITY_WEIGHT, "history": HISTORY_WEIGHT}
+    results = []
+    for row, (offer, price_analysis) in enumerate(zip(offers, price_analyses)):
+        matches = []
+        for col in top_columns(scores[row], top_k):
+            km = distance_km[row, col]
+            result = {
+                "score": int(scores[row, col]),
+                "components": {name: round(float(matrix[row, col]) * weights[name], 1) for name, matrix in components.items()},
+                "distance_km": None if np.isnan(km) else float(km),
+            }
+            matches.append(build_match(offer, buyers[col], result, price_analysis))
+        results.append(matches)
+    return results
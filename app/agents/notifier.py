@@ -1,6 +1,9 @@
 from typing import Dict, Any, List
 import requests
 from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger("agents.notifier")
 
 async def send_notification(user_id: str, matches: List[Dict[str, Any]], price_analysis: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -23,7 +26,7 @@ async def send_notification(user_id: str, matches: List[Dict[str, Any]], price_a
             top_match = matches[0]
             message += f" Top match: {top_match.get('buyer_name', 'Unknown')} - Score: {top_match.get('match_score')}%"
         
-        print(f"Notification for user {user_id}: {message}")
+        logger.info("Notification: %s", message, extra={"user_id": user_id})
         
         # TODO: Integrate with actual notification services:
         # - Twilio for SMS
@@ -40,7 +43,7 @@ async def send_notification(user_id: str, matches: List[Dict[str, Any]], price_a
         }
         
     except Exception as e:
-        print(f"Notification error: {e}")
+        logger.error("Notification error: %s", e)
         return {
             "status": "error",
             "message": f"Failed to send notification: {str(e)}",
@@ -50,11 +53,11 @@ async def send_notification(user_id: str, matches: List[Dict[str, Any]], price_a
 async def send_sms_notification(phone_number: str, message: str) -> Dict[str, Any]:
     """Send SMS notification (placeholder for future implementation)"""
     # TODO: Implement SMS sending via Twilio or Africa's Talking
-    print(f"SMS to {phone_number}: {message}")
+    logger.info("SMS (simulated): %s", message, extra={"phone": phone_number})
     return {"status": "success", "message": "SMS sent (simulated)"}
 
 async def send_email_notification(email: str, subject: str, message: str) -> Dict[str, Any]:
     """Send email notification (placeholder for future implementation)"""
     # TODO: Implement email sending via SendGrid or similar
-    print(f"Email to {email} - {subject}: {message}")
+    logger.info("Email (simulated) - %s: %s", subject, message, extra={"email": email})
     return {"status": "success", "message": "Email sent (simulated)"}
@@ -1,93 +1,154 @@
-import json
+import asyncio
 import uuid
 from datetime import datetime
-from typing import Dict, Any
-from app.core.database import get_db
-from app.services import call_mistral_ai, call_aiml_api, call_nebius_ai, call_elevenlabs
+from typing import Dict, Any, Callable, Awaitable, Iterable, List, Optional
+from app.core.config import settings
+from app.core.database import enqueue_catch
+from app.services import call_mistral_ai, call_aiml_api, call_nebius_ai
 from app.agents.matchmaker import find_matches
 from app.agents.credit_scoring import calculate_credit_score
 from app.agents.notifier import send_notification
+from app.agents.voice_jobs import voice_jobs
+from app.core.logger import get_logger
+
+logger = get_logger("agents.orchestrator")
+
+class Stage:
+    """
+    A node in the analysis graph.
+
+    `run` receives a dict with the results of the stages listed in `deps`.
+    If it raises or exceeds `timeout`, `fallback(error)` provides the result
+    instead, so a failing stage never takes the whole analysis down.
+    """
+    def __init__(self, name: str, run: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 deps: Iterable[str] = (), timeout: Optional[float] = None,
+                 fallback: Callable[[Exception], Any] = lambda e: None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+
+async def run_stages(stages: List[Stage]) -> Dict[str, Any]:
+    """
+    Run a list of stages, each as soon as its dependencies are done.
+
+    Stages must be listed after the stages they depend on. Independent
+    stages run concurrently, so the total latency is that of the slowest
+    dependency chain rather than the sum of all stages.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_stage(stage: Stage):
+        if stage.deps:
+            await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+        inputs = {dep: tasks[dep].result() for dep in stage.deps}
+        try:
+            return await asyncio.wait_for(stage.run(inputs), stage.timeout)
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                e = TimeoutError(f"{stage.name} exceeded {stage.timeout}s deadline")
+            logger.warning("Stage failed, using fallback: %s", e, extra={"stage": stage.name})
+            return stage.fallback(e)
+
+    # Validate the whole graph before starting anything, so a bad graph leaves no tasks behind
+    seen = set()
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in seen]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown or later stages: {missing}")
+        seen.add(stage.name)
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    return {name: task.result() for name, task in tasks.items()}
 
 async def orchestrate_analysis(request: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Orchestrate the complete analysis workflow:
-    1. Call AI services for analysis
-    2. Find potential matches
-    3. Update credit score
-    4. Send notifications
-    5. Store results
+    Orchestrate the complete analysis workflow as a stage graph:
+    1. Price analysis, market insights, image analysis and credit score (concurrently)
+    2. Voice job submission and matchmaking (once price + insights are ready)
+    3. Store results and send notifications
     """
     try:
         # 1. Price analysis (Mistral)
-        try:
+        async def price_stage(_):
             price_analysis = await call_mistral_ai(request)
             if not isinstance(price_analysis, dict):
                 raise ValueError("Mistral returned unexpected format")
-        except Exception as e:
-            print(f"[orchestrator] Mistral AI failed: {e}")
-            price_analysis = {
-                "fair_price": 0,
-                "currency": "TZS",
-                "reasoning": "fallback price due to AI error",
-                "confidence_score": 0.0
-            }
+            return price_analysis
 
         # 2. Market insights (AI/ML API)
-        try:
+        async def insights_stage(_):
             market_insights = await call_aiml_api(request)
-            if isinstance(market_insights, dict):
-                market_trend = market_insights.get("market_trend") or market_insights.get("market_trend_major", "stable")
-            else:
-                market_trend = str(market_insights)
-                market_insights = {"market_trend": market_trend}
-        except Exception as e:
-            print(f"[orchestrator] AI/ML API failed: {e}")
-            market_insights = {"market_trend": "stable", "recommendation": "Sell in the morning for best price"}
+            if not isinstance(market_insights, dict):
+                market_insights = {"market_trend": str(market_insights)}
+            return market_insights
 
         # 3. Image analysis (Nebius) - optional
-        try:
-            image_analysis = await call_nebius_ai(request.get('image_data')) if request.get('image_data') else {"analysis": "no image provided"}
+        async def image_stage(_):
+            if not request.get('image_data'):
+                return {"analysis": "no image provided"}
+            image_analysis = await call_nebius_ai(request.get('image_data'))
             if not isinstance(image_analysis, dict):
                 image_analysis = {"analysis": str(image_analysis)}
-        except Exception as e:
-            print(f"[orchestrator] Nebius AI failed: {e}")
-            image_analysis = {"analysis": "image analysis failed", "confidence": 0.0}
+            return image_analysis
 
-        # 4. Voice generation (ElevenLabs) - optional
-        try:
-            voice_filename = await call_elevenlabs(price_analysis, market_insights)
-            if not voice_filename or voice_filename in ("voice_generation_failed", "voice_generation_timeout", "voice_generation_skipped", "voice_connection_error"):
-                voice_filename = None
-        except Exception as e:
-            print(f"[orchestrator] ElevenLabs failed: {e}")
-            voice_filename = None
+        # 4. Voice generation (ElevenLabs) - optional, synthesized in the background
+        async def voice_stage(inputs):
+            return voice_jobs.submit(inputs["price"], inputs["insights"])
 
         # 5. Find matches
-        try:
-            matches = await find_matches(request, price_analysis, market_insights)
-        except Exception as e:
-            print(f"[orchestrator] Matchmaking failed: {e}")
-            matches = []
+        async def matches_stage(inputs):
+            return await find_matches(request, inputs["price"], inputs["insights"])
 
-        # 6. Update credit score
-        try:
-            credit_info = await calculate_credit_score(request.get('user_id'))
-        except Exception as e:
-            print(f"[orchestrator] Credit scoring failed: {e}")
-            credit_info = {"credit_score": 700, "loan_eligible": True}
+        # 6. Credit score (independent of the AI stages)
+        async def credit_stage(_):
+            return await calculate_credit_score(request.get('user_id'))
 
-        # 7. Store catch record
-        try:
-            await store_catch_record(request, price_analysis, market_insights, image_analysis, voice_filename)
-        except Exception as e:
-            print(f"[orchestrator] Database storage failed: {e}")
+        # 7. Store catch record (after credit scoring, so the score reflects prior catches)
+        async def store_stage(inputs):
+            await store_catch_record(request, inputs["price"], inputs["insights"], inputs["image"])
 
         # 8. Send notifications (if matches found)
-        if matches:
-            try:
-                await send_notification(request.get('user_id'), matches, price_analysis)
-            except Exception as e:
-                print(f"[orchestrator] Notification failed: {e}")
+        async def notify_stage(inputs):
+            if inputs["matches"]:
+                await send_notification(request.get('user_id'), inputs["matches"], inputs["price"])
+
+        ai_timeout = settings.ANALYSIS_AI_STAGE_TIMEOUT
+        db_timeout = settings.ANALYSIS_DB_STAGE_TIMEOUT
+        results = await run_stages([
+            Stage("price", price_stage, timeout=ai_timeout, fallback=lambda e: {
+                "fair_price": 0,
+                "currency": "TZS",
+                "reasoning": "fallback price due to AI error",
+                "confidence_score": 0.0
+            }),
+            Stage("insights", insights_stage, timeout=ai_timeout, fallback=lambda e: {
+                "market_trend": "stable", "recommendation": "Sell in the morning for best price"
+            }),
+            Stage("image", image_stage, timeout=ai_timeout, fallback=lambda e: {
+                "analysis": "image analysis failed", "confidence": 0.0
+            }),
+            Stage("credit", credit_stage, timeout=db_timeout, fallback=lambda e: {
+                "credit_score": 700, "loan_eligible": True
+            }),
+            Stage("voice", voice_stage, deps=("price", "insights")),
+            Stage("matches", matches_stage, deps=("price", "insights"), timeout=db_timeout, fallback=lambda e: []),
+            Stage("store", store_stage, deps=("price", "insights", "image", "credit"), timeout=db_timeout),
+            Stage("notify", notify_stage, deps=("matches", "price"), timeout=db_timeout),
+        ])
+
+        price_analysis = results["price"]
+        market_insights = results["insights"]
+        voice_job = results["voice"]
 
         # 9. Build summary
         try:
@@ -100,39 +161,42 @@ async def orchestrate_analysis(request: Dict[str, Any]) -> Dict[str, Any]:
                 f"Market trend: {market_trend_text}."
             )
         except Exception as e:
-            print(f"[orchestrator] Summary build failed: {e}")
+            logger.warning("Summary build failed: %s", e)
             summary = f"{request.get('quantity_kg', 0)} kg of {request.get('fish_type', 'fish')} in {request.get('location', 'unknown')}. Price unavailable."
 
         return {
             "status": "success",
             "price_analysis": price_analysis,
             "market_insights": market_insights,
-            "image_analysis": image_analysis,
-            "voice_message_url": f"/audio/{voice_filename}" if voice_filename else None,
+            "image_analysis": results["image"],
+            # Set right away when the same message was already synthesized, otherwise poll the job
+            "voice_message_url": f"/audio/{voice_job.filename}" if voice_job and voice_job.filename else None,
+            "voice_job_id": voice_job.id if voice_job else None,
             "analysis_summary": summary,
-            "matches": matches,
-            "credit_info": credit_info,
+            "matches": results["matches"],
+            "credit_info": results["credit"],
             "recommendation": f"Suggested price: TZS {suggested_price} per kg" if suggested_price != "N/A" else "No price recommendation"
         }
 
     except Exception as e:
-        print(f"[orchestrator] Fatal error: {e}")
+        logger.exception("Fatal error: %s", e)
         return {
             "status": "error",
             "message": f"Processing failed: {str(e)}"
         }
 
-async def store_catch_record(request: Dict[str, Any], price_analysis: Dict, market_insights: Dict, image_analysis: Dict, voice_filename: str):
-    """Store catch record in database"""
+async def store_catch_record(request: Dict[str, Any], price_analysis: Dict, market_insights: Dict, image_analysis: Dict):
+    """Store catch record in database (and update user_aggregates), batched with other catches"""
     try:
-        conn = await get_db()
-        catch_id = str(uuid.uuid4())
-        
-        await conn.execute(
-            """INSERT INTO catches (id, user_id, fish_type, quantity_kg, location, price_analysis, created_at)
-               VALUES ($1, $2, $3, $4, $5, $6, $7)""",
-            catch_id, request.get('user_id'), request.get('fish_type'), request.get('quantity_kg'), 
-            request.get('location'), json.dumps(price_analysis), datetime.now()
-        )
+        # Inserts the catch and updates the user's aggregates together
+        await enqueue_catch({
+            "id": str(uuid.uuid4()),
+            "user_id": request.get('user_id'),
+            "fish_type": request.get('fish_type'),
+            "quantity_kg": request.get('quantity_kg'),
+            "location": request.get('location'),
+            "price_analysis": price_analysis,
+            "created_at": datetime.now()
+        })
     except Exception as e:
-        print(f"Database storage error: {e}")
+        logger.error("Database storage error: %s", e)
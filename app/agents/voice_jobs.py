@@ -0,0 +1,135 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.services.elevenlabs_service import call_elevenlabs, cached_voice_message, voice_enabled
+from app.core.logger import get_logger
+
+logger = get_logger("agents.voice_jobs")
+
+# call_elevenlabs returns one of these instead of a filename when synthesis did not happen
+VOICE_ERRORS = ("voice_generation_failed", "voice_generation_timeout", "voice_generation_skipped", "voice_connection_error")
+
+
+class VoiceJob:
+    __slots__ = ("id", "status", "filename", "error", "created_at", "finished_at", "price_data", "market_data")
+
+    def __init__(self, price_data: Dict[str, Any], market_data: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.filename: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.price_data = price_data
+        self.market_data = market_data
+
+    def finish(self, filename: Optional[str], error: Optional[str] = None):
+        self.status = "done" if filename else "failed"
+        self.filename = filename
+        self.error = error
+        self.finished_at = time.time()
+        self.price_data = self.market_data = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "audio_url": f"/audio/{self.filename}" if self.filename else None,
+            "stream_url": f"/audio/jobs/{self.id}/stream" if self.status in ("queued", "running") else None,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class VoiceJobQueue:
+    """
+    Voice messages are synthesized by a fixed pool of workers off a bounded
+    queue, so /api/analyze-catch returns a job id instead of waiting for
+    the TTS provider. Finished jobs are kept for VOICE_JOB_RETENTION
+    seconds so clients can poll /audio/jobs/{id}.
+    """
+    def __init__(self):
+        self.jobs: "OrderedDict[str, VoiceJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=settings.VOICE_JOB_QUEUE_SIZE)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.VOICE_JOB_WORKERS)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def submit(self, price_data: Dict[str, Any], market_data: Dict[str, Any]) -> Optional[VoiceJob]:
+        """Queue a voice message; None when voice is disabled or the queue is full"""
+        if not voice_enabled():
+            return None
+        self._prune()
+        job = VoiceJob(price_data, market_data)
+        cached = cached_voice_message(price_data, market_data)
+        if cached:
+            job.finish(cached)
+        else:
+            if self._queue is None:
+                self.start()
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                logger.warning("Voice job queue full, skipping voice message", extra={"queued": self._queue.qsize()})
+                return None
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[VoiceJob]:
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - settings.VOICE_JOB_RETENTION
+        while self.jobs:
+            job = next(iter(self.jobs.values()))
+            if job.created_at > cutoff:
+                break
+            self.jobs.popitem(last=False)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                result = await asyncio.wait_for(
+                    call_elevenlabs(job.price_data, job.market_data), settings.ANALYSIS_VOICE_STAGE_TIMEOUT
+                )
+                if not result or result in VOICE_ERRORS:
+                    job.finish(None, result or "voice_generation_failed")
+                else:
+                    job.finish(result)
+            except asyncio.TimeoutError:
+                job.finish(None, "voice_generation_timeout")
+            except Exception as e:
+                logger.error("Voice job failed: %s", e, extra={"job_id": job.id})
+                job.finish(None, "voice_generation_failed")
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": statuses,
+        }
+
+
+voice_jobs = VoiceJobQueue()
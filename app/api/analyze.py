@@ -1,20 +1,26 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Any, Dict, Optional
 from app.models import FishCatchRequest
+from app.api.auth import current_claims, check_user
 from app.agents.orchestrator import orchestrate_analysis
+from app.core.logger import get_logger
+
+logger = get_logger("api.analyze")
 
 router = APIRouter()
 
 @router.post("/analyze-catch")
-async def analyze_catch(request: FishCatchRequest, background_tasks: BackgroundTasks):
+async def analyze_catch(request: FishCatchRequest, claims: Optional[Dict[str, Any]] = Depends(current_claims)):
     """
     Analyze a fisher's catch:
     - call Mistral for price analysis
     - call an AI/ML API for market insights
     - optionally call Nebius for image analysis
-    - optionally generate a voice file via ElevenLabs
-    - store the record in background
+    - optionally queue a voice message via ElevenLabs (poll /audio/jobs/{voice_job_id})
+    - store the record
     Returns a safe, renderable analysis_summary plus detailed JSON pieces.
     """
+    check_user(claims, request.user_id)
     try:
         # Run the complete analysis workflow
         result = await orchestrate_analysis(request.dict())
@@ -26,5 +32,5 @@ async def analyze_catch(request: FishCatchRequest, background_tasks: BackgroundT
 
     except Exception as e:
         # If something truly unexpected happens, return a 500 with error info
-        print(f"[analyze_catch] Fatal error: {e}")
+        logger.exception("Fatal error: %s", e)
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
@@ -1,36 +1,110 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from datetime import datetime
+import asyncio
 import uuid
+from typing import Any, Dict, Optional, Set
 from app.models import UserCreate, LoginRequest, UserType
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, DuplicateUserError
+from app.core.security import password_hasher, token_authority, CredentialsBusyError, InvalidTokenError
+from app.agents.matchmaker import buyer_index
+from app.core.logger import get_logger
+
+logger = get_logger("api.auth")
 
 router = APIRouter()
 
+# Background password upgrades started by login, kept referenced until done
+_rehash_tasks: Set[asyncio.Task] = set()
+
+bearer = HTTPBearer(auto_error=False)
+
+DUPLICATE_USER_RESPONSE = {"status": "error", "message": "User with that email/phone already exists"}
+
+def unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+async def current_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)) -> Optional[Dict[str, Any]]:
+    """
+    Dependency: claims of the caller's bearer token, verified without a
+    database lookup. Without a token this is None, unless REQUIRE_AUTH is
+    set; a token that is present must be valid.
+    """
+    if credentials is None:
+        if settings.REQUIRE_AUTH:
+            raise unauthorized("Not authenticated")
+        return None
+    try:
+        return token_authority.verify(credentials.credentials)
+    except InvalidTokenError as e:
+        raise unauthorized(f"Invalid token: {e}")
+
+async def require_claims(claims: Optional[Dict[str, Any]] = Depends(current_claims)) -> Dict[str, Any]:
+    """Dependency: like current_claims, but a token is always required"""
+    if claims is None:
+        raise unauthorized("Not authenticated")
+    return claims
+
+def check_user(claims: Optional[Dict[str, Any]], user_id: Optional[str]):
+    """403 when the caller's token belongs to someone other than `user_id` (superusers may act for anyone)"""
+    if claims is not None and claims["sub"] != user_id and claims.get("typ") != UserType.SUPERUSER.value:
+        raise HTTPException(status_code=403, detail="Token does not belong to this user")
+
+def busy_response() -> HTTPException:
+    return HTTPException(status_code=503, detail="Authentication is busy, please retry", headers={"Retry-After": "1"})
+
+async def rehash_password(user_id: str, password: str):
+    """Store a fresh hash for a user whose hash is legacy plaintext or uses old scrypt parameters"""
+    try:
+        conn = await get_db()
+        await conn.update_password_hash(user_id, await password_hasher.hash(password))
+        logger.info("Password hash upgraded", extra={"user_id": user_id})
+    except Exception as e:
+        logger.warning("Password rehash failed: %s", e, extra={"user_id": user_id})
+
 @router.post("/register")
 async def register(user: UserCreate):
     """Register a new user"""
     try:
+        # Hash first, so the slow part is not between the duplicate check and the insert
+        password_hash = await password_hasher.hash(user.password)
+
         # Basic duplicate check
         conn = await get_db()
         # Check existing by email or phone
-        existing = []
+        existing = None
         if user.email:
-            existing = await conn.fetch("SELECT * FROM users WHERE email = $1", user.email)
+            existing = await conn.fetch_user_by_email(user.email)
         if not existing and user.phone:
-            existing = await conn.fetch("SELECT * FROM users WHERE phone = $1", user.phone)
+            existing = await conn.fetch_user_by_phone(user.phone)
         if existing:
-            return {"status": "error", "message": "User with that email/phone already exists"}
+            return DUPLICATE_USER_RESPONSE
 
         user_id = str(uuid.uuid4())
+        try:
+            # The database enforces uniqueness for registrations that race past the check
+            await conn.insert_user({
+                "id": user_id, "email": user.email, "phone": user.phone, "password_hash": password_hash,
+                "user_type": user.user_type.value, "name": user.name, "organization": user.organization,
+                "location": user.location, "preferred_fish_types": user.preferred_fish_types,
+                "capacity_kg": user.capacity_kg, "created_at": datetime.now()
+            })
+        except DuplicateUserError:
+            return DUPLICATE_USER_RESPONSE
 
-        await conn.execute(
-            "INSERT INTO users (id, email, phone, password_hash, user_type, name, organization, location, created_at) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)",
-            user_id, user.email, user.phone, user.password, user.user_type.value, user.name, user.organization, user.location, datetime.now()
-        )
+        # Make new buyers matchable right away
+        if user.user_type == UserType.BUYER:
+            buyer_index.add({
+                "id": user_id, "email": user.email, "name": user.name, "organization": user.organization,
+                "location": user.location, "preferred_fish_types": user.preferred_fish_types, "capacity_kg": user.capacity_kg
+            })
 
         return {"status": "success", "user_id": user_id, "user_type": user.user_type.value}
+    except CredentialsBusyError:
+        raise busy_response()
     except Exception as e:
-        print("Registration error:", e)
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/login")
@@ -40,24 +114,35 @@ async def login(credentials: LoginRequest):
         conn = await get_db()
         user = None
         if credentials.email:
-            user = await conn.fetchrow(
-                "SELECT * FROM users WHERE email = $1 AND password_hash = $2",
-                credentials.email, credentials.password
-            )
+            user = await conn.fetch_user_by_email(credentials.email)
         if not user and credentials.phone:
-            user = await conn.fetchrow(
-                "SELECT * FROM users WHERE phone = $1 AND password_hash = $2",
-                credentials.phone, credentials.password
-            )
+            user = await conn.fetch_user_by_phone(credentials.phone)
+        valid, needs_rehash = await password_hasher.verify(credentials.password, user["password_hash"] if user else None)
         
-        if user:
-            return {
+        if valid:
+            if needs_rehash:
+                task = asyncio.create_task(rehash_password(user["id"], credentials.password))
+                _rehash_tasks.add(task)
+                task.add_done_callback(_rehash_tasks.discard)
+            response = {
                 "user_id": user['id'],
                 "user_type": user['user_type'],
                 "message": "Login successful"
             }
+            if token_authority.enabled:
+                token, claims = token_authority.issue(user['id'], user['user_type'])
+                response.update({"access_token": token, "token_type": "bearer", "expires_at": claims["exp"]})
+            return response
         else:
             return {"status": "error", "message": "Invalid credentials"}
             
+    except CredentialsBusyError:
+        raise busy_response()
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+@router.post("/logout")
+async def logout(claims: Dict[str, Any] = Depends(require_claims)):
+    """Revoke the caller's access token"""
+    token_authority.revoke(claims)
+    return {"status": "success", "message": "Logged out"}
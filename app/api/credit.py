@@ -1,12 +1,15 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from typing import Any, Dict, Optional
 from app.models import LoanApplication, InsuranceQuoteRequest
+from app.api.auth import current_claims, check_user
 from app.agents.credit_scoring import calculate_credit_score
 
 router = APIRouter()
 
 @router.post("/credit-score")
-async def get_credit_score(user_id: str):
+async def get_credit_score(user_id: str, claims: Optional[Dict[str, Any]] = Depends(current_claims)):
     """Get user's credit score"""
+    check_user(claims, user_id)
     try:
         credit_info = await calculate_credit_score(user_id)
         return credit_info
@@ -20,8 +23,9 @@ async def get_credit_score(user_id: str):
         }
 
 @router.post("/loan-application")
-async def apply_for_loan(application: LoanApplication):
+async def apply_for_loan(application: LoanApplication, claims: Optional[Dict[str, Any]] = Depends(current_claims)):
     """Apply for a loan"""
+    check_user(claims, application.user_id)
     try:
         # Get credit score first
         credit_info = await calculate_credit_score(application.user_id)
@@ -1,7 +1,13 @@
+import asyncio
 from fastapi import APIRouter
-from app.models import MatchRequest
-from app.agents.matchmaker import find_matches
+from app.models import MatchRequest, BatchMatchRequest
+from app.agents.matchmaker import find_matches, find_matches_batch, normalize_fish_type
+from app.utils.geo import normalize_place
 from app.services import call_mistral_ai, call_aiml_api
+from app.core.providers import request_priority, BATCH
+from app.core.logger import get_logger
+
+logger = get_logger("api.match")
 
 router = APIRouter()
 
@@ -35,5 +41,51 @@ async def make_match(request: MatchRequest):
         }
 
     except Exception as e:
-        print("Matchmaking error:", str(e))
+        logger.error("Matchmaking error: %s", e)
+        return {"status": "error", "message": str(e)}
+
+@router.post("/match/batch")
+async def make_batch_match(request: BatchMatchRequest):
+    """
+    Match many offers at once (e.g. a cooperative's morning upload).
+    Price and market analysis run once per distinct (fish_type, location),
+    then all offers are scored against all buyers in one pass.
+    """
+    # Upstream AI calls made for this batch queue behind interactive traffic when rate limited
+    request_priority.set(BATCH)
+    try:
+        offers = [offer.dict() for offer in request.offers]
+
+        # 1) One AI analysis per distinct species/place; the first offer of each group is the representative
+        groups = {}
+        for offer in offers:
+            key = (normalize_fish_type(offer["fish_type"]), normalize_place(offer["location"]))
+            groups.setdefault(key, offer)
+
+        async def analyse(offer):
+            return await asyncio.gather(call_mistral_ai(offer), call_aiml_api(offer))
+
+        analyses = dict(zip(groups, await asyncio.gather(*(analyse(offer) for offer in groups.values()))))
+        keys = [(normalize_fish_type(offer["fish_type"]), normalize_place(offer["location"])) for offer in offers]
+
+        # 2) Score every offer against every buyer
+        matches = await find_matches_batch(offers, [analyses[key][0] for key in keys], top_k=request.top_k)
+
+        return {
+            "status": "success",
+            "count": len(offers),
+            "ai_calls_saved": 2 * (len(offers) - len(groups)),
+            "results": [
+                {
+                    "offer": offer,
+                    "price_analysis": analyses[key][0],
+                    "market_insights": analyses[key][1],
+                    "matches": offer_matches
+                }
+                for offer, key, offer_matches in zip(offers, keys, matches)
+            ]
+        }
+
+    except Exception as e:
+        logger.error("Batch matchmaking error: %s", e)
         return {"status": "error", "message": str(e)}
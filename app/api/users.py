@@ -1,51 +1,45 @@
-from fastapi import APIRouter
-from typing import Dict, Any
+from fastapi import APIRouter, Query
+from typing import Dict, Any, Optional
 from app.core.database import get_db
+from app.utils.pagination import list_response
 
 router = APIRouter()
 
 @router.get("/users/{user_id}/stats")
 async def get_user_stats(user_id: str) -> Dict[str, Any]:
     conn = await get_db()
-    catches = await conn.fetch("SELECT * FROM catches WHERE user_id = $1", user_id)
-    total_catches = len(catches)
-    total_qty = sum(float(c.get("quantity_kg", 0)) for c in catches)
-    prices = [float(c.get("price_analysis", {}).get("fair_price", 0)) for c in catches if isinstance(c.get("price_analysis"), dict)]
-    avg_price = round(sum(prices) / len(prices), 2) if prices else 0
+    aggregates = await conn.fetch_user_aggregates(user_id)
+    price_count = aggregates["price_count"]
     return {
         "user_id": user_id,
-        "total_catches": total_catches,
-        "total_quantity_kg": total_qty,
-        "average_price_per_kg": avg_price,
+        "total_catches": aggregates["catch_count"],
+        "total_quantity_kg": aggregates["total_quantity_kg"],
+        "average_price_per_kg": round(aggregates["price_sum"] / price_count, 2) if price_count else 0,
+        "last_activity": aggregates["last_activity"],
     }
 
 @router.get("/users/{user_id}/catches")
-async def get_user_catches(user_id: str) -> Dict[str, Any]:
+async def get_user_catches(user_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                           format: str = Query("json", pattern="^(json|ndjson)$")):
+    """User's catches, newest first. Pass `next_cursor` back as `cursor` for the next page, or format=ndjson to stream all"""
     conn = await get_db()
-    catches = await conn.fetch("SELECT * FROM catches WHERE user_id = $1", user_id)
-    return {"user_id": user_id, "count": len(catches), "catches": catches}
+    return await list_response(conn, "catches", {"user_id": user_id}, "catches", limit, cursor, format,
+                               extra={"user_id": user_id})
 
 @router.get("/users/{user_id}/transactions")
-async def get_user_transactions(user_id: str) -> Dict[str, Any]:
+async def get_user_transactions(user_id: str, limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                                format: str = Query("json", pattern="^(json|ndjson)$")):
+    """User's transactions, newest first (paginated like /catches)"""
     conn = await get_db()
-    # MemoryDB fallback: returns empty unless transactions were added
-    try:
-        txs = await conn.fetch("SELECT * FROM transactions WHERE user_id = $1", user_id)
-    except Exception:
-        txs = []
-    return {"user_id": user_id, "count": len(txs), "transactions": txs}
+    return await list_response(conn, "transactions", {"user_id": user_id}, "transactions", limit, cursor, format,
+                               extra={"user_id": user_id})
 
 @router.get("/users/{user_id}/market-insights")
 async def get_user_market_insights(user_id: str) -> Dict[str, Any]:
-    # For now, summarize from catches' price_analysis
+    # For now, summarize from the user's per-species catch counts
     conn = await get_db()
-    catches = await conn.fetch("SELECT * FROM catches WHERE user_id = $1", user_id)
-    fish_types = {}
-    for c in catches:
-        ft = c.get("fish_type")
-        if ft:
-            fish_types[ft] = fish_types.get(ft, 0) + 1
-    top_fish = sorted(fish_types.items(), key=lambda x: x[1], reverse=True)
+    aggregates = await conn.fetch_user_aggregates(user_id)
+    top_fish = sorted(aggregates["species_counts"].items(), key=lambda x: x[1], reverse=True)
     return {
         "user_id": user_id,
         "top_fish_types": top_fish,
@@ -8,6 +8,14 @@ load_dotenv()
 class Settings:
     # Database
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+
+    # PostgreSQL pool. DB_PGBOUNCER disables prepared statements for transaction-mode pgbouncer
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME: float = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
     
     # API Keys
     MISTRAL_API_KEY: Optional[str] = os.getenv("MISTRAL_API_KEY")
@@ -19,7 +27,101 @@ class Settings:
     APP_NAME: str = "SamakiCash API"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
-    
+
+    # Logging
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # fraction of DEBUG/INFO records kept
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    # Outbound HTTP (AI providers)
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "30"))
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "200"))
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    # Connect to configured providers at startup so the first requests reuse warm connections
+    HTTP_WARMUP: bool = os.getenv("HTTP_WARMUP", "true").lower() == "true"
+    HTTP_WARMUP_TIMEOUT: float = float(os.getenv("HTTP_WARMUP_TIMEOUT", "3"))
+
+    # Per-provider circuit breakers and adaptive read timeouts (p95 latency x multiplier)
+    BREAKER_WINDOW_SECONDS: float = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+    BREAKER_MIN_REQUESTS: int = int(os.getenv("BREAKER_MIN_REQUESTS", "10"))
+    BREAKER_ERROR_RATE: float = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    BREAKER_OPEN_SECONDS: float = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    BREAKER_HALF_OPEN_PROBES: int = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "2.0"))
+    ADAPTIVE_TIMEOUT_MIN: float = float(os.getenv("ADAPTIVE_TIMEOUT_MIN", "2.0"))
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES: int = int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "20"))
+
+    # Client-side rate limits per provider (requests/second, 0 = unlimited) and how long a call may queue
+    MISTRAL_RATE_LIMIT: float = float(os.getenv("MISTRAL_RATE_LIMIT", "5"))
+    MISTRAL_RATE_BURST: float = float(os.getenv("MISTRAL_RATE_BURST", "10"))
+    AIML_RATE_LIMIT: float = float(os.getenv("AIML_RATE_LIMIT", "5"))
+    AIML_RATE_BURST: float = float(os.getenv("AIML_RATE_BURST", "10"))
+    NEBIUS_RATE_LIMIT: float = float(os.getenv("NEBIUS_RATE_LIMIT", "2"))
+    NEBIUS_RATE_BURST: float = float(os.getenv("NEBIUS_RATE_BURST", "5"))
+    ELEVENLABS_RATE_LIMIT: float = float(os.getenv("ELEVENLABS_RATE_LIMIT", "2"))
+    ELEVENLABS_RATE_BURST: float = float(os.getenv("ELEVENLABS_RATE_BURST", "4"))
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))  # interactive requests
+    RATE_LIMIT_MAX_WAIT_BATCH: float = float(os.getenv("RATE_LIMIT_MAX_WAIT_BATCH", "30"))
+
+    # Catch analysis stage deadlines (seconds)
+    ANALYSIS_AI_STAGE_TIMEOUT: float = float(os.getenv("ANALYSIS_AI_STAGE_TIMEOUT", "35"))
+    ANALYSIS_VOICE_STAGE_TIMEOUT: float = float(os.getenv("ANALYSIS_VOICE_STAGE_TIMEOUT", "50"))
+    ANALYSIS_DB_STAGE_TIMEOUT: float = float(os.getenv("ANALYSIS_DB_STAGE_TIMEOUT", "10"))
+
+    # Mistral price-analysis cache (set PRICE_CACHE_PATH to persist it in SQLite)
+    PRICE_CACHE_TTL: float = float(os.getenv("PRICE_CACHE_TTL", "10800"))
+    PRICE_CACHE_MAX_ENTRIES: int = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "2048"))
+    PRICE_CACHE_PATH: Optional[str] = os.getenv("PRICE_CACHE_PATH")
+
+    # AI/ML market-insights cache; expired entries are served for up to INSIGHTS_CACHE_STALE_TTL while refreshing
+    INSIGHTS_CACHE_TTL: float = float(os.getenv("INSIGHTS_CACHE_TTL", "3600"))
+    INSIGHTS_CACHE_STALE_TTL: float = float(os.getenv("INSIGHTS_CACHE_STALE_TTL", "21600"))
+    INSIGHTS_CACHE_MAX_ENTRIES: int = int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", "1024"))
+
+    # ElevenLabs: pin a voice to skip the catalogue, otherwise it is cached for ELEVENLABS_VOICES_TTL
+    ELEVENLABS_VOICE_ID: Optional[str] = os.getenv("ELEVENLABS_VOICE_ID")
+    ELEVENLABS_VOICES_TTL: float = float(os.getenv("ELEVENLABS_VOICES_TTL", "3600"))
+
+    # Synthesized voice messages, content-addressed and evicted LRU past the size limit
+    AUDIO_DIR: str = os.getenv("AUDIO_DIR", "audio")
+    AUDIO_CACHE_MAX_BYTES: int = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    # Background voice generation
+    VOICE_JOB_WORKERS: int = int(os.getenv("VOICE_JOB_WORKERS", "4"))
+    VOICE_JOB_QUEUE_SIZE: int = int(os.getenv("VOICE_JOB_QUEUE_SIZE", "1000"))
+    VOICE_JOB_RETENTION: float = float(os.getenv("VOICE_JOB_RETENTION", "3600"))  # seconds a finished job stays pollable
+
+    # Password hashing (scrypt) on a bounded worker pool; logins beyond the queue get 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+    SCRYPT_N: int = int(os.getenv("SCRYPT_N", "16384"))
+    SCRYPT_R: int = int(os.getenv("SCRYPT_R", "8"))
+    SCRYPT_P: int = int(os.getenv("SCRYPT_P", "1"))
+
+    # Access tokens (HMAC-signed). REQUIRE_AUTH makes a bearer token mandatory on user-scoped endpoints
+    SECRET_KEY: Optional[str] = os.getenv("SECRET_KEY")
+    ACCESS_TOKEN_TTL: float = float(os.getenv("ACCESS_TOKEN_TTL", "86400"))
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    REQUIRE_AUTH: bool = os.getenv("REQUIRE_AUTH", "false").lower() == "true"
+
+    # Matchmaking
+    BUYER_INDEX_REFRESH_SECONDS: float = float(os.getenv("BUYER_INDEX_REFRESH_SECONDS", "300"))
+
+    # Write-behind catch persistence: flush after CATCH_WRITE_BATCH_SIZE records or CATCH_WRITE_MAX_DELAY seconds
+    CATCH_WRITE_BATCH_SIZE: int = int(os.getenv("CATCH_WRITE_BATCH_SIZE", "200"))
+    CATCH_WRITE_MAX_DELAY: float = float(os.getenv("CATCH_WRITE_MAX_DELAY", "0.5"))
+    CATCH_WRITE_QUEUE_SIZE: int = int(os.getenv("CATCH_WRITE_QUEUE_SIZE", "10000"))
+    # Seconds shutdown waits for buffered catches while the database is unreachable
+    CATCH_WRITE_CLOSE_TIMEOUT: float = float(os.getenv("CATCH_WRITE_CLOSE_TIMEOUT", "30"))
+
+    # List endpoints: page size limits and rows per batch when streaming NDJSON
+    PAGE_SIZE_DEFAULT: int = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+    PAGE_SIZE_MAX: int = int(os.getenv("PAGE_SIZE_MAX", "500"))
+    DB_STREAM_BATCH_SIZE: int = int(os.getenv("DB_STREAM_BATCH_SIZE", "500"))
+
     # CORS Settings
     CORS_ORIGINS: list = [
         "https://samakicash-pwa.onrender.com",
@@ -1,9 +1,23 @@
 import os
+import re
 import json
+import math
+import asyncio
+import bisect
+import heapq
+import itertools
+import logging
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Tuple
 from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.write_behind import WriteBehindQueue, default_is_data_error
+
+logger = get_logger("database")
 
 # PostgreSQL imports
 try:
@@ -12,93 +26,616 @@ try:
 except ImportError:
     POSTGRES_AVAILABLE = False
 
+
+class DuplicateUserError(Exception):
+    """A user with the same id, email or phone already exists"""
+
+
+# Table layouts for the in-memory store: columns, hash-indexed columns and JSON columns
+MEMORY_TABLES = {
+    "users": (
+        ("id", "email", "phone", "password_hash", "user_type", "name", "organization", "location",
+         "preferred_fish_types", "capacity_kg", "created_at"),
+        ("email", "phone", "user_type"),
+        (),
+    ),
+    "catches": (
+        ("id", "user_id", "fish_type", "quantity_kg", "location", "price_analysis", "image_analysis",
+         "market_insights", "voice_filename", "created_at"),
+        ("user_id",),
+        ("price_analysis", "image_analysis", "market_insights"),
+    ),
+    "loans": (
+        ("id", "user_id", "amount", "purpose", "status", "created_at"),
+        ("user_id",),
+        (),
+    ),
+    "insurance": (
+        ("id", "user_id", "coverage_type", "coverage_amount", "annual_premium", "status", "created_at"),
+        ("user_id",),
+        (),
+    ),
+    "transactions": (
+        ("id", "user_id", "type", "amount", "currency", "metadata", "created_at"),
+        ("user_id",),
+        ("metadata",),
+    ),
+}
+
+# Columns safe to return from user listings (never the password hash)
+USER_PUBLIC_COLUMNS = ("id", "email", "phone", "user_type", "name", "organization", "location",
+                       "preferred_fish_types", "capacity_kg", "created_at")
+
+def _projection(table: str, columns: Iterable[str]) -> Tuple[str, ...]:
+    """Validate a column list against the table layout before it is put into SQL"""
+    columns = tuple(columns)
+    unknown = set(columns) - set(MEMORY_TABLES[table][0])
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {sorted(unknown)}")
+    return columns
+
+# Strings accepted as a fair_price; the same pattern guards the ::numeric cast in SQL
+_NUMERIC = re.compile(r"-?[0-9]+(\.[0-9]+)?")
+
+def _fair_price(price_analysis: Any) -> Optional[float]:
+    """
+    Numeric fair_price from a stored price_analysis, or None.
+
+    Accepts what the SQL aggregates accept: finite JSON numbers (not
+    booleans) and strings matching _NUMERIC, so "nan", "inf" or True never
+    reach a running price_sum.
+    """
+    if not isinstance(price_analysis, dict):
+        return None
+    price = price_analysis.get("fair_price")
+    if isinstance(price, bool):
+        return None
+    if isinstance(price, (int, float)):
+        return float(price) if math.isfinite(price) else None
+    if isinstance(price, str) and _NUMERIC.fullmatch(price):
+        return float(price)
+    return None
+
+def empty_user_aggregates(user_id: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "catch_count": 0,
+        "total_quantity_kg": 0.0,
+        "price_sum": 0.0,
+        "price_count": 0,
+        "species_counts": {},
+        "last_activity": None,
+    }
+
+def aggregate_deltas(records: Iterable[Dict[str, Any]]) -> List[Tuple]:
+    """
+    Sum a batch of catches per user into user_aggregates deltas:
+    (user_id, catch_count, quantity_kg, price_sum, price_count, species_counts json, last_activity)
+    """
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        delta = deltas.setdefault(record["user_id"], empty_user_aggregates(record["user_id"]))
+        delta["catch_count"] += 1
+        delta["total_quantity_kg"] += float(record.get("quantity_kg") or 0)
+        price = _fair_price(record.get("price_analysis"))
+        if price is not None:
+            delta["price_sum"] += price
+            delta["price_count"] += 1
+        if record.get("fish_type"):
+            species = delta["species_counts"]
+            species[record["fish_type"]] = species.get(record["fish_type"], 0) + 1
+        created_at = record.get("created_at")
+        if created_at and (delta["last_activity"] is None or created_at > delta["last_activity"]):
+            delta["last_activity"] = created_at
+    return [
+        (d["user_id"], d["catch_count"], d["total_quantity_kg"], d["price_sum"], d["price_count"],
+         json.dumps(d["species_counts"]), d["last_activity"])
+        for d in deltas.values()
+    ]
+
+# Adds one user's delta from aggregate_deltas() ($1 … $7) to user_aggregates, merging species counts
+UPSERT_USER_AGGREGATES_SQL = """
+    INSERT INTO user_aggregates AS a
+        (user_id, catch_count, total_quantity_kg, price_sum, price_count, species_counts, last_activity)
+    VALUES ($1, $2, $3, $4, $5, $6::jsonb, $7)
+    ON CONFLICT (user_id) DO UPDATE SET
+        catch_count = a.catch_count + EXCLUDED.catch_count,
+        total_quantity_kg = a.total_quantity_kg + EXCLUDED.total_quantity_kg,
+        price_sum = a.price_sum + EXCLUDED.price_sum,
+        price_count = a.price_count + EXCLUDED.price_count,
+        species_counts = (
+            SELECT COALESCE(jsonb_object_agg(species, total), '{}'::jsonb)
+            FROM (
+                SELECT key AS species, SUM(value::int) AS total
+                FROM (SELECT * FROM jsonb_each_text(a.species_counts)
+                      UNION ALL SELECT * FROM jsonb_each_text(EXCLUDED.species_counts)) counts
+                GROUP BY key
+            ) merged
+        ),
+        last_activity = GREATEST(a.last_activity, EXCLUDED.last_activity)
+"""
+
+# Overwrites one user's row with totals recomputed from catches ($1 … $7, as in aggregate_deltas())
+REPLACE_USER_AGGREGATES_SQL = """
+    INSERT INTO user_aggregates
+        (user_id, catch_count, total_quantity_kg, price_sum, price_count, species_counts, last_activity)
+    VALUES ($1, $2, $3, $4, $5, $6::jsonb, $7)
+    ON CONFLICT (user_id) DO UPDATE SET
+        catch_count = EXCLUDED.catch_count,
+        total_quantity_kg = EXCLUDED.total_quantity_kg,
+        price_sum = EXCLUDED.price_sum,
+        price_count = EXCLUDED.price_count,
+        species_counts = EXCLUDED.species_counts,
+        last_activity = EXCLUDED.last_activity
+"""
+
+def aggregates_from_summary(user_id: str, summary: Dict[str, Any], species: List[Tuple[str, int]]) -> Dict[str, Any]:
+    """user_aggregates row built from fetch_catch_summary() and fetch_catch_counts_by_fish_type()"""
+    return {
+        "user_id": user_id,
+        "catch_count": summary["catch_count"],
+        "total_quantity_kg": summary["total_quantity_kg"],
+        "price_sum": summary["price_sum"],
+        "price_count": summary["price_count"],
+        "species_counts": dict(species),
+        "last_activity": summary["last_activity"],
+    }
+
+# Columns written by insert_user, in parameter order
+USER_INSERT_COLUMNS = ("id", "email", "phone", "password_hash", "user_type", "name", "organization", "location",
+                       "preferred_fish_types", "capacity_kg", "created_at")
+
+# Named statements with fixed SQL. Each is prepared once per pooled connection, on
+# first use, and reused from asyncpg's statement cache after that; the names key
+# the per-statement timings on /api/debug/db.
+STATEMENTS = {
+    "user_by_email": "SELECT * FROM users WHERE email = $1",
+    "user_by_phone": "SELECT * FROM users WHERE phone = $1",
+    "insert_user": f"INSERT INTO users ({', '.join(USER_INSERT_COLUMNS)}) "
+                   f"VALUES ({', '.join(f'${i}' for i in range(1, len(USER_INSERT_COLUMNS) + 1))})",
+    "transaction_counts": "SELECT user_id, COUNT(*) AS count FROM transactions "
+                          "WHERE user_id = ANY($1::varchar[]) GROUP BY user_id",
+    "insert_catch": "INSERT INTO catches (id, user_id, fish_type, quantity_kg, location, price_analysis, created_at) "
+                    "VALUES ($1, $2, $3, $4, $5, $6, $7)",
+    "upsert_user_aggregates": UPSERT_USER_AGGREGATES_SQL,
+    "user_aggregates": "SELECT * FROM user_aggregates WHERE user_id = $1",
+    "replace_user_aggregates": REPLACE_USER_AGGREGATES_SQL,
+    "catch_user_ids": "SELECT DISTINCT user_id FROM catches",
+    "catch_summary": """SELECT COUNT(*) AS catch_count,
+                               COALESCE(SUM(quantity_kg), 0) AS total_quantity_kg,
+                               COALESCE(SUM(fair_price), 0) AS price_sum,
+                               COUNT(fair_price) AS price_count,
+                               MAX(created_at) AS last_activity
+                        FROM (SELECT quantity_kg, created_at,
+                                     CASE WHEN price_analysis->>'fair_price' ~ '^-?[0-9]+(\\.[0-9]+)?$'
+                                          THEN (price_analysis->>'fair_price')::numeric END AS fair_price
+                              FROM catches WHERE user_id = $1) priced""",
+    "catch_counts_by_fish_type": "SELECT fish_type, COUNT(*) AS count FROM catches "
+                                 "WHERE user_id = $1 AND fish_type IS NOT NULL GROUP BY fish_type ORDER BY count DESC",
+    "has_users": "SELECT EXISTS (SELECT 1 FROM users)",
+    "update_password_hash": "UPDATE users SET password_hash = $2 WHERE id = $1",
+}
+
+class QueryMetrics:
+    """Pool acquire waits and execution time per statement name, for /api/debug/db"""
+    def __init__(self):
+        self.acquires = 0
+        self.acquire_wait_total = 0.0
+        self.acquire_wait_max = 0.0
+        self.statements: Dict[str, List[float]] = {}
+
+    def acquired(self, wait: float):
+        self.acquires += 1
+        self.acquire_wait_total += wait
+        self.acquire_wait_max = max(self.acquire_wait_max, wait)
+
+    def executed(self, name: str, elapsed: float):
+        entry = self.statements.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "acquires": self.acquires,
+            "acquire_wait_avg_ms": round(1000 * self.acquire_wait_total / self.acquires, 3) if self.acquires else 0.0,
+            "acquire_wait_max_ms": round(1000 * self.acquire_wait_max, 3),
+            "statements": {
+                name: {"calls": count, "avg_ms": round(1000 * total / count, 3), "max_ms": round(1000 * worst, 3)}
+                for name, (count, total, worst) in sorted(self.statements.items())
+            },
+        }
+
+_INSERT_RE = re.compile(
+    r"^\s*INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES\s*\(([^)]*)\)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_SELECT_RE = re.compile(
+    r"^\s*SELECT\s+(.+?)\s+FROM\s+(\w+)(?:\s+WHERE\s+(.+?))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_CONDITION_RE = re.compile(r"^\s*(\w+)\s*=\s*\$(\d+)\s*$")
+
+@lru_cache(maxsize=256)
+def _parse_query(query: str) -> Tuple:
+    """Parse the SQL subset MemoryDB understands into a reusable plan"""
+    match = _INSERT_RE.match(query)
+    if match:
+        table = match.group(1).lower()
+        columns = tuple(c.strip() for c in match.group(2).split(","))
+        placeholders = [p.strip() for p in match.group(3).split(",")]
+        if len(columns) != len(placeholders) or not all(p.startswith("$") for p in placeholders):
+            raise ValueError(f"MemoryDB cannot parse INSERT: {query}")
+        return ("insert", table, columns, tuple(int(p[1:]) - 1 for p in placeholders))
+
+    match = _SELECT_RE.match(query)
+    if match:
+        projection = match.group(1).strip()
+        columns = None if projection == "*" else tuple(c.strip() for c in projection.split(","))
+        conditions = []
+        if match.group(3):
+            for clause in re.split(r"\s+AND\s+", match.group(3), flags=re.IGNORECASE):
+                condition = _CONDITION_RE.match(clause)
+                if not condition:
+                    raise ValueError(f"MemoryDB cannot parse condition '{clause}' in: {query}")
+                conditions.append((condition.group(1), int(condition.group(2)) - 1))
+        return ("select", match.group(2).lower(), columns, tuple(conditions))
+
+    raise ValueError(f"MemoryDB does not support query: {query}")
+
+def _insert_sorted(keys: List[Tuple[Any, Any]], key: Tuple[Any, Any]):
+    # Rows mostly arrive in created_at order, so this is usually an append
+    if not keys or key >= keys[-1]:
+        keys.append(key)
+    else:
+        bisect.insort(keys, key)
+
+def _newest_first(keys: List[Tuple[Any, Any]], before: Optional[Tuple[Any, Any]]) -> Iterator[Tuple[Any, Any]]:
+    """Keys of a sorted list in descending order, strictly below `before`"""
+    end = bisect.bisect_left(keys, before) if before is not None else len(keys)
+    for i in range(end - 1, -1, -1):
+        yield keys[i]
+
+class MemoryTable:
+    """
+    Row store for one in-memory table.
+
+    Rows are kept as tuples keyed by primary key (`id`), and each indexed
+    column maps values to the (created_at, id) keys of the rows holding
+    them, kept sorted, so equality lookups on `id` and indexed columns are
+    O(1) rather than a table scan. A sorted list of (created_at, id) keys
+    over the whole table, and the sorted per-value lists, support keyset
+    pagination by bisection.
+    """
+    def __init__(self, name: str, columns: Tuple[str, ...], indexed: Tuple[str, ...] = (), json_columns: Tuple[str, ...] = ()):
+        self.name = name
+        self.columns = columns
+        self.positions = {column: i for i, column in enumerate(columns)}
+        self.json_columns = set(json_columns)
+        self.rows: Dict[Any, tuple] = {}
+        self.indexes: Dict[str, Dict[Any, List[Tuple[Any, Any]]]] = {column: {} for column in indexed}
+        self.on_insert: Optional[Callable[[Dict[str, Any]], None]] = None
+        self.order: List[Tuple[Any, Any]] = []
+
+    def insert(self, values: Dict[str, Any]):
+        unknown = set(values) - set(self.positions)
+        if unknown:
+            raise ValueError(f"Unknown columns for {self.name}: {sorted(unknown)}")
+        row_id = values.get("id") or str(uuid.uuid4())
+        if row_id in self.rows:
+            raise ValueError(f"Duplicate key id={row_id} in {self.name}")
+        row = []
+        for column in self.columns:
+            value = values.get(column)
+            if column in self.json_columns and isinstance(value, str):
+                value = json.loads(value)
+            row.append(value)
+        row[self.positions["id"]] = row_id
+        if "created_at" in self.positions and row[self.positions["created_at"]] is None:
+            row[self.positions["created_at"]] = datetime.now()
+        self.rows[row_id] = tuple(row)
+        key = (row[self.positions["created_at"]], row_id)
+        for column, index in self.indexes.items():
+            _insert_sorted(index.setdefault(row[self.positions[column]], []), key)
+        _insert_sorted(self.order, key)
+        if self.on_insert is not None:
+            self.on_insert(dict(zip(self.columns, row)))
+
+    def update(self, row_id: Any, values: Dict[str, Any]) -> bool:
+        """Set columns on one row; False if there is no such row"""
+        row = self.rows.get(row_id)
+        if row is None:
+            return False
+        if set(values) & ({"id", "created_at"} | set(self.indexes)):
+            raise ValueError(f"Cannot update key or indexed columns of {self.name}")
+        updated = list(row)
+        for column, value in values.items():
+            updated[self.positions[column]] = value
+        self.rows[row_id] = tuple(updated)
+        return True
+
+    def lookup(self, conditions: List[Tuple[str, Any]]) -> Iterable[tuple]:
+        """
+        Yield rows matching all (column, value) conditions, using an index when possible.
+        A list/tuple/set value matches any of its members (SQL `= ANY`).
+        """
+        for column, value in conditions:
+            if column not in self.positions:
+                raise ValueError(f"Unknown column {column} for {self.name}")
+        candidates = None
+        for column, value in conditions:
+            values = value if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+            if column == "id":
+                candidates = [self.rows[v] for v in dict.fromkeys(values) if v in self.rows]
+                break
+            if column in self.indexes:
+                index = self.indexes[column]
+                candidates = [self.rows[row_id] for v in dict.fromkeys(values) for _, row_id in index.get(v, ())]
+                break
+        if candidates is None:
+            candidates = self.rows.values()
+        checks = [
+            (self.positions[column], set(value) if isinstance(value, (list, tuple, set, frozenset)) else None, value)
+            for column, value in conditions
+        ]
+        for row in candidates:
+            if all(row[pos] in members if members is not None else row[pos] == value for pos, members, value in checks):
+                yield row
+
+    def scan_newest_first(self, conditions: List[Tuple[str, Any]], before: Optional[Tuple[Any, Any]] = None) -> Iterable[tuple]:
+        """
+        Rows matching `conditions` ordered by (created_at, id) descending, strictly before `before`.
+
+        Walks the sorted key list of one indexed condition backwards from
+        `before` (merging the lists when it matches several values) and
+        checks the other conditions per row, so a page costs O(log n) plus
+        the rows it reads.
+        """
+        indexed = next(((column, value) for column, value in conditions if column in self.indexes), None)
+        if indexed is None:
+            if conditions:
+                created_pos, id_pos = self.positions["created_at"], self.positions["id"]
+                rows = sorted(self.lookup(conditions), key=lambda row: (row[created_pos], row[id_pos]), reverse=True)
+                if before is not None:
+                    rows = (row for row in rows if (row[created_pos], row[id_pos]) < before)
+                yield from rows
+                return
+            keys = _newest_first(self.order, before)
+        else:
+            column, value = indexed
+            values = value if isinstance(value, (list, tuple, set, frozenset)) else (value,)
+            index = self.indexes[column]
+            streams = [_newest_first(index[v], before) for v in dict.fromkeys(values) if v in index]
+            keys = heapq.merge(*streams, reverse=True) if len(streams) > 1 else (streams[0] if streams else ())
+        checks = [
+            (self.positions[column], set(value) if isinstance(value, (list, tuple, set, frozenset)) else None, value)
+            for column, value in conditions
+        ]
+        for _, row_id in keys:
+            row = self.rows[row_id]
+            if all(row[pos] in members if members is not None else row[pos] == value for pos, members, value in checks):
+                yield row
+
+    def to_dict(self, row: tuple, columns: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        if columns is None:
+            return dict(zip(self.columns, row))
+        return {column: row[self.positions[column]] for column in columns}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
 class MemoryDB:
     """In-memory database for development and fallback"""
     def __init__(self):
-        self.users = []
-        self.catches = []
-        self.loans = []
-        self.insurance = []
-        self.transactions = []
-    
+        self.tables = {
+            name: MemoryTable(name, columns, indexed, json_columns)
+            for name, (columns, indexed, json_columns) in MEMORY_TABLES.items()
+        }
+        # Per-user running totals over catches, kept in step with every catch insert
+        self.user_aggregates: Dict[str, Dict[str, Any]] = {}
+        self.tables["catches"].on_insert = self._apply_catch
+
+    def _table(self, name: str) -> MemoryTable:
+        if name not in self.tables:
+            raise ValueError(f"Unknown table: {name}")
+        return self.tables[name]
+
     async def execute(self, query, *params):
-        print(f"DB Query: {query}")
-        print(f"Params: {params}")
-        
-        # Handle user inserts
-        if "INSERT INTO users" in query:
-            user_data = {
-                "id": params[0],
-                "email": params[1],
-                "phone": params[2] if len(params) > 2 else None,
-                "password_hash": params[3],
-                "user_type": params[4],
-                "name": params[5] if len(params) > 5 else None,
-                "organization": params[6] if len(params) > 6 else None,
-                "location": params[7] if len(params) > 7 else None,
-                "created_at": params[8] if len(params) > 8 else datetime.now()
-            }
-            self.users.append(user_data)
-            return True
-            
-        # Handle catch inserts
-        elif "INSERT INTO catches" in query:
-            catch_data = {
-                "id": params[0],
-                "user_id": params[1],
-                "fish_type": params[2],
-                "quantity_kg": params[3],
-                "location": params[4],
-                "price_analysis": json.loads(params[5]) if isinstance(params[5], str) else params[5],
-                "created_at": params[6] if len(params) > 6 else datetime.now()
-            }
-            self.catches.append(catch_data)
-            return True
-            
-        # Handle user queries
-        elif "SELECT * FROM users" in query:
-            if "email" in query and "password_hash" in query:
-                email = params[0]
-                password = params[1]
-                for user in self.users:
-                    if user['email'] == email and user['password_hash'] == password:
-                        return [user]
-                return []
-            if "phone" in query and "password_hash" in query:
-                phone = params[0]
-                password = params[1]
-                for user in self.users:
-                    if user.get('phone') == phone and user['password_hash'] == password:
-                        return [user]
-                return []
-            return self.users
-            
-        # Handle catch queries
-        elif "SELECT * FROM catches" in query:
-            if "user_id" in query:
-                user_id = params[0]
-                return [catch for catch in self.catches if catch['user_id'] == user_id]
-            return self.catches
-            
-        return True
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("memory query", extra={"query": " ".join(query.split())[:120], "param_count": len(params)})
+
+        plan = _parse_query(query)
+        if plan[0] == "insert":
+            _, table, columns, param_positions = plan
+            self._table(table).insert({column: params[i] for column, i in zip(columns, param_positions)})
+            return "INSERT 0 1"
+
+        _, table, columns, conditions = plan
+        table = self._table(table)
+        rows = table.lookup([(column, params[i]) for column, i in conditions])
+        return [table.to_dict(row, columns) for row in rows]
     
     async def fetchrow(self, query, *params):
         result = await self.execute(query, *params)
-        return result[0] if result and len(result) > 0 else None
+        return result[0] if isinstance(result, list) and result else None
     
     async def fetch(self, query, *params):
         result = await self.execute(query, *params)
-        return result if result else []
+        return result if isinstance(result, list) else []
     
     async def fetchval(self, query, *params):
-        result = await self.execute(query, *params)
-        return len(result) if result else 0
+        row = await self.fetchrow(query, *params)
+        return next(iter(row.values())) if row else None
+
+    async def fetch_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        table = self.tables["users"]
+        return next((table.to_dict(row) for row in table.lookup([("email", email)])), None)
+
+    async def fetch_user_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        table = self.tables["users"]
+        return next((table.to_dict(row) for row in table.lookup([("phone", phone)])), None)
+
+    def _user_taken(self, record: Dict[str, Any]) -> bool:
+        table = self.tables["users"]
+        if record.get("id") in table.rows:
+            return True
+        taken = [(column, record[column]) for column in ("email", "phone") if record.get(column)]
+        return any(next(iter(table.lookup([condition])), None) for condition in taken)
+
+    async def insert_user(self, record: Dict[str, Any]):
+        """Insert a user; raises DuplicateUserError like the unique constraints on PostgreSQL"""
+        if self._user_taken(record):
+            raise DuplicateUserError("user with that id, email or phone already exists")
+        self.tables["users"].insert(record)
+
+    async def insert_users(self, records: List[Dict[str, Any]]):
+        """Insert users, skipping any whose id, email or phone is already taken"""
+        for record in records:
+            if not self._user_taken(record):
+                self.tables["users"].insert(record)
+
+    async def has_users(self) -> bool:
+        return bool(self.tables["users"].rows)
+
+    async def update_password_hash(self, user_id: str, password_hash: str):
+        self.tables["users"].update(user_id, {"password_hash": password_hash})
+
+    async def ping(self) -> bool:
+        return True
+
+    async def fetch_users_by_type(self, user_types: Iterable[str], columns: Iterable[str] = USER_PUBLIC_COLUMNS) -> List[Dict[str, Any]]:
+        """Users whose user_type is one of `user_types`, projected to `columns`"""
+        columns = _projection("users", columns)
+        table = self.tables["users"]
+        return [
+            table.to_dict(row, columns)
+            for user_type in dict.fromkeys(user_types)
+            for row in table.lookup([("user_type", user_type)])
+        ]
+
+    async def fetch_transaction_counts(self, user_ids: Iterable[str]) -> Dict[str, int]:
+        """Number of transactions recorded for each of `user_ids`"""
+        index = self.tables["transactions"].indexes["user_id"]
+        return {user_id: len(index.get(user_id, ())) for user_id in user_ids}
+
+    async def fetch_page(self, table: str, filters: Dict[str, Any], limit: int,
+                         after: Optional[Tuple[Any, Any]] = None, columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` rows, newest first by (created_at, id), strictly older than the `after` key"""
+        columns = _projection(table, columns) if columns is not None else None
+        memory_table = self._table(table)
+        rows = memory_table.scan_newest_first(list(filters.items()), before=after)
+        return [memory_table.to_dict(row, columns) for _, row in zip(range(limit), rows)]
+
+    async def iter_rows(self, table: str, filters: Dict[str, Any], after: Optional[Tuple[Any, Any]] = None,
+                        columns: Optional[Iterable[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream matching rows newest first, yielding to the event loop between batches.
+
+        Each batch is read into a list and the next one starts a fresh scan
+        below the last key sent, so inserts made while the stream is
+        suspended never shift it into skipping or repeating rows.
+        """
+        columns = _projection(table, columns) if columns is not None else None
+        memory_table = self._table(table)
+        conditions = list(filters.items())
+        created_pos, id_pos = memory_table.positions["created_at"], memory_table.positions["id"]
+        while True:
+            batch = list(itertools.islice(memory_table.scan_newest_first(conditions, before=after),
+                                          settings.DB_STREAM_BATCH_SIZE))
+            for row in batch:
+                yield memory_table.to_dict(row, columns)
+            if len(batch) < settings.DB_STREAM_BATCH_SIZE:
+                return
+            after = (batch[-1][created_pos], batch[-1][id_pos])
+            await asyncio.sleep(0)
+
+    async def insert_catch(self, record: Dict[str, Any]):
+        """Insert a catch row; user_aggregates is updated in the same step"""
+        self.tables["catches"].insert(record)
+
+    async def insert_catches(self, records: List[Dict[str, Any]]):
+        for record in records:
+            self.tables["catches"].insert(record)
+
+    async def fetch_user_aggregates(self, user_id: str) -> Dict[str, Any]:
+        """Running totals for one user's catches, O(1)"""
+        aggregates = self.user_aggregates.get(user_id)
+        if aggregates is None:
+            return empty_user_aggregates(user_id)
+        return {**aggregates, "species_counts": dict(aggregates["species_counts"])}
+
+    async def fetch_catch_summary(self, user_id: str) -> Dict[str, Any]:
+        """Catch count, total quantity, fair price sum/count/average and last activity for one user"""
+        table = self.tables["catches"]
+        quantity_pos, price_pos = table.positions["quantity_kg"], table.positions["price_analysis"]
+        created_pos = table.positions["created_at"]
+        count, total_quantity, price_sum, price_count, last_activity = 0, 0.0, 0.0, 0, None
+        for row in table.lookup([("user_id", user_id)]):
+            count += 1
+            total_quantity += float(row[quantity_pos] or 0)
+            price = _fair_price(row[price_pos])
+            if price is not None:
+                price_sum += price
+                price_count += 1
+            if row[created_pos] and (last_activity is None or row[created_pos] > last_activity):
+                last_activity = row[created_pos]
+        return {
+            "catch_count": count,
+            "total_quantity_kg": total_quantity,
+            "price_sum": price_sum,
+            "price_count": price_count,
+            "average_price_per_kg": price_sum / price_count if price_count else None,
+            "last_activity": last_activity,
+        }
+
+    async def fetch_catch_counts_by_fish_type(self, user_id: str) -> List[Tuple[str, int]]:
+        """(fish_type, catch count) pairs for one user, most frequent first"""
+        table = self.tables["catches"]
+        fish_pos = table.positions["fish_type"]
+        counts: Dict[str, int] = {}
+        for row in table.lookup([("user_id", user_id)]):
+            if row[fish_pos]:
+                counts[row[fish_pos]] = counts.get(row[fish_pos], 0) + 1
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+    async def rebuild_user_aggregates(self, user_id: str) -> Dict[str, Any]:
+        """Recompute one user's running totals from their catches"""
+        aggregates = aggregates_from_summary(user_id, await self.fetch_catch_summary(user_id),
+                                             await self.fetch_catch_counts_by_fish_type(user_id))
+        self.user_aggregates[user_id] = aggregates
+        return await self.fetch_user_aggregates(user_id)
+
+    def _apply_catch(self, row: Dict[str, Any]):
+        """Fold one inserted catch into user_aggregates"""
+        aggregates = self.user_aggregates.setdefault(row["user_id"], empty_user_aggregates(row["user_id"]))
+        aggregates["catch_count"] += 1
+        aggregates["total_quantity_kg"] += float(row.get("quantity_kg") or 0)
+        price = _fair_price(row.get("price_analysis"))
+        if price is not None:
+            aggregates["price_sum"] += price
+            aggregates["price_count"] += 1
+        if row.get("fish_type"):
+            species = aggregates["species_counts"]
+            species[row["fish_type"]] = species.get(row["fish_type"], 0) + 1
+        created_at = row.get("created_at")
+        if created_at and (aggregates["last_activity"] is None or created_at > aggregates["last_activity"]):
+            aggregates["last_activity"] = created_at
 
 class PostgreSQLDB:
-    """PostgreSQL database connection"""
+    """
+    PostgreSQL database connection.
+
+    Pool size and statement caching come from Settings. asyncpg prepares
+    a query the first time a connection runs it and keeps it in that
+    connection's statement cache (DB_STATEMENT_CACHE_SIZE), so the fixed
+    STATEMENTS are parsed and planned once per connection. DB_PGBOUNCER
+    turns the cache off, as prepared statements do not survive
+    transaction-mode pooling.
+    """
     def __init__(self, database_url: str):
         self.database_url = database_url
         self.pool = None
+        self.metrics = QueryMetrics()
     
     async def init_pool(self):
         """Initialize connection pool"""
@@ -107,54 +644,299 @@ class PostgreSQLDB:
         
         self.pool = await asyncpg.create_pool(
             self.database_url,
-            min_size=1,
-            max_size=10,
-            command_timeout=60
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            command_timeout=settings.DB_COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=settings.DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+            statement_cache_size=0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE
         )
-    
+
     async def close_pool(self):
         """Close connection pool"""
         if self.pool:
             await self.pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Acquire a pooled connection, recording how long the wait was"""
+        started = time.perf_counter()
+        async with self.pool.acquire() as conn:
+            self.metrics.acquired(time.perf_counter() - started)
+            yield conn
+
+    @asynccontextmanager
+    async def _timed(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.executed(name, time.perf_counter() - started)
+
+    async def _run(self, method: str, name: str, query: str, *params):
+        async with self.connection() as conn:
+            async with self._timed(name):
+                return await getattr(conn, method)(query, *params)
+
+    async def run_statement(self, method: str, name: str, *params):
+        """Run a named statement from STATEMENTS with `method` (fetch, fetchrow, fetchval or execute)"""
+        return await self._run(method, name, STATEMENTS[name], *params)
     
     async def execute(self, query, *params):
         """Execute a query"""
-        async with self.pool.acquire() as conn:
-            return await conn.execute(query, *params)
+        return await self._run("execute", "raw", query, *params)
     
     async def fetchrow(self, query, *params):
         """Fetch a single row"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow(query, *params)
+        return await self._run("fetchrow", "raw", query, *params)
     
     async def fetch(self, query, *params):
         """Fetch multiple rows"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetch(query, *params)
+        return await self._run("fetch", "raw", query, *params)
     
     async def fetchval(self, query, *params):
         """Fetch a single value"""
-        async with self.pool.acquire() as conn:
-            return await conn.fetchval(query, *params)
+        return await self._run("fetchval", "raw", query, *params)
+
+    async def fetch_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        row = await self.run_statement("fetchrow", "user_by_email", email)
+        return dict(row) if row is not None else None
+
+    async def fetch_user_by_phone(self, phone: str) -> Optional[Dict[str, Any]]:
+        row = await self.run_statement("fetchrow", "user_by_phone", phone)
+        return dict(row) if row is not None else None
+
+    async def insert_user(self, record: Dict[str, Any]):
+        """Insert a user; a unique violation on id, email or phone raises DuplicateUserError"""
+        try:
+            await self.run_statement("execute", "insert_user", *(record.get(column) for column in USER_INSERT_COLUMNS))
+        except asyncpg.UniqueViolationError as e:
+            raise DuplicateUserError(str(e)) from e
+
+    async def insert_users(self, records: List[Dict[str, Any]]):
+        """Insert users in one batch, skipping any that conflict with an existing id, email or phone"""
+        rows = [tuple(record.get(column) for column in USER_INSERT_COLUMNS) for record in records]
+        async with self.connection() as conn:
+            async with self._timed("insert_users"), conn.transaction():
+                await conn.executemany(STATEMENTS["insert_user"] + " ON CONFLICT DO NOTHING", rows)
+
+    async def has_users(self) -> bool:
+        return await self.run_statement("fetchval", "has_users")
+
+    async def update_password_hash(self, user_id: str, password_hash: str):
+        await self.run_statement("execute", "update_password_hash", user_id, password_hash)
+
+    async def ping(self) -> bool:
+        """Round trip to the server, for the readiness probe"""
+        return await self._run("fetchval", "ping", "SELECT 1") == 1
+
+    async def fetch_users_by_type(self, user_types: Iterable[str], columns: Iterable[str] = USER_PUBLIC_COLUMNS) -> List[Dict[str, Any]]:
+        """Users whose user_type is one of `user_types`, projected to `columns` (uses idx_users_user_type)"""
+        columns = _projection("users", columns)
+        rows = await self._run(
+            "fetch", "users_by_type",
+            f"SELECT {', '.join(columns)} FROM users WHERE user_type = ANY($1::varchar[])",
+            list(user_types)
+        )
+        return [dict(row) for row in rows]
+
+    async def fetch_transaction_counts(self, user_ids: Iterable[str]) -> Dict[str, int]:
+        """Number of transactions recorded for each of `user_ids`"""
+        user_ids = list(user_ids)
+        rows = await self.run_statement("fetch", "transaction_counts", user_ids)
+        counts = {user_id: 0 for user_id in user_ids}
+        counts.update({row["user_id"]: row["count"] for row in rows})
+        return counts
+
+    @staticmethod
+    def _page_query(table: str, filters: Dict[str, Any], after: Optional[Tuple[Any, Any]],
+                    columns: Optional[Iterable[str]], limit: Optional[int]) -> Tuple[str, List[Any]]:
+        """Keyset-paginated SELECT, newest first; relies on the (..., created_at, id) indexes"""
+        if table not in MEMORY_TABLES:
+            raise ValueError(f"Unknown table: {table}")
+        projection = ", ".join(_projection(table, columns)) if columns is not None else "*"
+        _projection(table, filters)
+        clauses, params = [], []
+        for column, value in filters.items():
+            params.append(list(value) if isinstance(value, (list, tuple, set, frozenset)) else value)
+            clauses.append(f"{column} = ANY(${len(params)})" if isinstance(value, (list, tuple, set, frozenset)) else f"{column} = ${len(params)}")
+        if after is not None:
+            params.extend(after)
+            clauses.append(f"(created_at, id) < (${len(params) - 1}, ${len(params)})")
+        query = f"SELECT {projection} FROM {table}"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at DESC, id DESC"
+        if limit is not None:
+            params.append(limit)
+            query += f" LIMIT ${len(params)}"
+        return query, params
+
+    async def fetch_page(self, table: str, filters: Dict[str, Any], limit: int,
+                         after: Optional[Tuple[Any, Any]] = None, columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Up to `limit` rows, newest first by (created_at, id), strictly older than the `after` key"""
+        query, params = self._page_query(table, filters, after, columns, limit)
+        return [dict(row) for row in await self._run("fetch", f"page:{table}", query, *params)]
+
+    async def iter_rows(self, table: str, filters: Dict[str, Any], after: Optional[Tuple[Any, Any]] = None,
+                        columns: Optional[Iterable[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream matching rows newest first through a server-side cursor"""
+        query, params = self._page_query(table, filters, after, columns, None)
+        async with self.connection() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(query, *params, prefetch=settings.DB_STREAM_BATCH_SIZE):
+                    yield dict(row)
+
+    async def insert_catch(self, record: Dict[str, Any]):
+        """Insert a catch row and update user_aggregates in one transaction"""
+        await self.insert_catches([record])
+
+    async def insert_catches(self, records: List[Dict[str, Any]]):
+        """Insert a batch of catches and fold them into user_aggregates (one upsert per user) in one transaction"""
+        rows = [
+            (record["id"], record["user_id"], record["fish_type"], record["quantity_kg"], record["location"],
+             json.dumps(record["price_analysis"]) if record.get("price_analysis") is not None else None,
+             record["created_at"])
+            for record in records
+        ]
+        async with self.connection() as conn:
+            async with self._timed("insert_catches"), conn.transaction():
+                await conn.executemany(STATEMENTS["insert_catch"], rows)
+                await conn.executemany(STATEMENTS["upsert_user_aggregates"], aggregate_deltas(records))
+
+    async def fetch_user_aggregates(self, user_id: str) -> Dict[str, Any]:
+        """Running totals for one user's catches, a single primary-key lookup"""
+        row = await self.run_statement("fetchrow", "user_aggregates", user_id)
+        if row is None:
+            return empty_user_aggregates(user_id)
+        species_counts = row["species_counts"]
+        return {
+            "user_id": user_id,
+            "catch_count": row["catch_count"],
+            "total_quantity_kg": float(row["total_quantity_kg"]),
+            "price_sum": float(row["price_sum"]),
+            "price_count": row["price_count"],
+            "species_counts": json.loads(species_counts) if isinstance(species_counts, str) else dict(species_counts or {}),
+            "last_activity": row["last_activity"],
+        }
+
+    @staticmethod
+    def _catch_summary(row) -> Dict[str, Any]:
+        price_count = row["price_count"]
+        return {
+            "catch_count": row["catch_count"],
+            "total_quantity_kg": float(row["total_quantity_kg"]),
+            "price_sum": float(row["price_sum"]),
+            "price_count": price_count,
+            "average_price_per_kg": float(row["price_sum"]) / price_count if price_count else None,
+            "last_activity": row["last_activity"],
+        }
+
+    async def fetch_catch_summary(self, user_id: str) -> Dict[str, Any]:
+        """Catch count, total quantity, fair price sum/count/average and last activity for one user, aggregated in SQL"""
+        return self._catch_summary(await self.run_statement("fetchrow", "catch_summary", user_id))
+
+    async def fetch_catch_counts_by_fish_type(self, user_id: str) -> List[Tuple[str, int]]:
+        """(fish_type, catch count) pairs for one user, most frequent first (GROUP BY in SQL)"""
+        rows = await self.run_statement("fetch", "catch_counts_by_fish_type", user_id)
+        return [(row["fish_type"], row["count"]) for row in rows]
+
+    @classmethod
+    async def _rebuild_on(cls, conn, user_id: str) -> Dict[str, Any]:
+        """Recompute one user's user_aggregates row on `conn` from the catch_summary and GROUP BY statements"""
+        summary = cls._catch_summary(await conn.fetchrow(STATEMENTS["catch_summary"], user_id))
+        species = await conn.fetch(STATEMENTS["catch_counts_by_fish_type"], user_id)
+        aggregates = aggregates_from_summary(user_id, summary, [(row["fish_type"], row["count"]) for row in species])
+        await conn.execute(
+            STATEMENTS["replace_user_aggregates"],
+            user_id, aggregates["catch_count"], aggregates["total_quantity_kg"], aggregates["price_sum"],
+            aggregates["price_count"], json.dumps(aggregates["species_counts"]), aggregates["last_activity"]
+        )
+        return aggregates
+
+    async def rebuild_user_aggregates(self, user_id: str) -> Dict[str, Any]:
+        """Recompute one user's user_aggregates row from their catches (repairs drift)"""
+        async with self.connection() as conn:
+            async with self._timed("rebuild_user_aggregates"):
+                return await self._rebuild_on(conn, user_id)
+
+    @classmethod
+    async def backfill_user_aggregates(cls, conn) -> int:
+        """Build user_aggregates rows for every user with catches; run once, when the table is created"""
+        rows = await conn.fetch(STATEMENTS["catch_user_ids"])
+        for row in rows:
+            await cls._rebuild_on(conn, row["user_id"])
+        if rows:
+            logger.info("Backfilled user aggregates", extra={"users": len(rows)})
+        return len(rows)
 
 # Global database instance
 _db_instance = None
 
+# Write-behind buffer for catch inserts (PostgreSQL only)
+_catch_writer: Optional[WriteBehindQueue] = None
+
 async def get_db():
     """Get database instance"""
     global _db_instance
     
     if _db_instance is None:
         if settings.USE_MEMORY_DB or not settings.DATABASE_URL:
-            print("Using in-memory database")
+            logger.info("Using in-memory database")
             _db_instance = MemoryDB()
         else:
-            print("Using PostgreSQL database")
+            logger.info("Using PostgreSQL database")
             _db_instance = PostgreSQLDB(settings.DATABASE_URL)
             await _db_instance.init_pool()
     
     return _db_instance
 
+def is_catch_data_error(e: Exception) -> bool:
+    """True for errors caused by the rows themselves (retrying the same batch cannot succeed)"""
+    if default_is_data_error(e):
+        return True
+    return POSTGRES_AVAILABLE and isinstance(e, (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError))
+
+async def enqueue_catch(record: Dict[str, Any]):
+    """
+    Persist a catch off the request path.
+
+    On PostgreSQL the record is buffered and written with others in one
+    batch transaction; waits only when the buffer is full. The in-memory
+    database inserts directly, as that costs no round trip.
+    """
+    global _catch_writer
+    db = await get_db()
+    if not isinstance(db, PostgreSQLDB):
+        await db.insert_catch(record)
+        return
+    if _catch_writer is None:
+        _catch_writer = WriteBehindQueue(
+            db.insert_catches,
+            max_batch=settings.CATCH_WRITE_BATCH_SIZE,
+            max_delay=settings.CATCH_WRITE_MAX_DELAY,
+            max_queue=settings.CATCH_WRITE_QUEUE_SIZE,
+            is_data_error=is_catch_data_error,
+        )
+    await _catch_writer.put(record)
+
+def catch_writer_stats() -> Optional[Dict[str, Any]]:
+    return _catch_writer.stats() if _catch_writer is not None else None
+
+def db_stats() -> Dict[str, Any]:
+    """Pool occupancy, acquire waits and statement timings (PostgreSQL only)"""
+    if not isinstance(_db_instance, PostgreSQLDB) or _db_instance.pool is None:
+        return {"backend": "memory"}
+    pool = _db_instance.pool
+    return {
+        "backend": "postgresql",
+        "pgbouncer_mode": settings.DB_PGBOUNCER,
+        "pool_size": pool.get_size(),
+        "pool_idle": pool.get_idle_size(),
+        "pool_min": pool.get_min_size(),
+        "pool_max": pool.get_max_size(),
+        **_db_instance.metrics.stats(),
+    }
+
 async def init_db():
     """Initialize database"""
     db = await get_db()
@@ -167,7 +949,7 @@ async def create_tables():
     """Create database tables"""
     db = await get_db()
     if isinstance(db, PostgreSQLDB):
-        async with db.pool.acquire() as conn:
+        async with db.connection() as conn:
             # Create users table
             await conn.execute("""
                 CREATE TABLE IF NOT EXISTS users (
@@ -182,6 +964,11 @@ async def create_tables():
                     created_at TIMESTAMP DEFAULT NOW()
                 )
             """)
+            # Buyer profile columns used by the matchmaker
+            await conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS preferred_fish_types VARCHAR[]")
+            await conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS capacity_kg DECIMAL")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_users_user_type ON users (user_type)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)")
             
             # Create catches table
             await conn.execute("""
@@ -199,6 +986,8 @@ async def create_tables():
                     FOREIGN KEY (user_id) REFERENCES users(id)
                 )
             """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_catches_user_created ON catches (user_id, created_at, id)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_catches_created ON catches (created_at, id)")
             
             # Create loans table
             await conn.execute("""
@@ -240,10 +1029,37 @@ async def create_tables():
                     FOREIGN KEY (user_id) REFERENCES users(id)
                 )
             """)
+            await conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_created ON transactions (user_id, created_at, id)")
+
+            # Create per-user aggregates table (maintained on every catch insert). It is
+            # backfilled from existing catches only when first created, in the same
+            # transaction, so normal starts skip the scan of catches and an interrupted
+            # backfill is retried on the next start. The advisory lock keeps concurrent
+            # workers from both creating it.
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock(hashtext('user_aggregates'))")
+                if await conn.fetchval("SELECT to_regclass('user_aggregates') IS NULL"):
+                    await conn.execute("""
+                        CREATE TABLE user_aggregates (
+                            user_id VARCHAR PRIMARY KEY,
+                            catch_count INTEGER NOT NULL DEFAULT 0,
+                            total_quantity_kg DECIMAL NOT NULL DEFAULT 0,
+                            price_sum DECIMAL NOT NULL DEFAULT 0,
+                            price_count INTEGER NOT NULL DEFAULT 0,
+                            species_counts JSONB NOT NULL DEFAULT '{}'::jsonb,
+                            last_activity TIMESTAMP,
+                            FOREIGN KEY (user_id) REFERENCES users(id)
+                        )
+                    """)
+                    await PostgreSQLDB.backfill_user_aggregates(conn)
 
 async def close_db():
     """Close database connections"""
-    global _db_instance
+    global _db_instance, _catch_writer
+    if _catch_writer is not None:
+        # Buffered catches are written before the pool goes away
+        await _catch_writer.close(timeout=settings.CATCH_WRITE_CLOSE_TIMEOUT)
+        _catch_writer = None
     if _db_instance and isinstance(_db_instance, PostgreSQLDB):
         await _db_instance.close_pool()
         _db_instance = None
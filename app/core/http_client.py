@@ -0,0 +1,63 @@
+import asyncio
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+# One pooled AsyncClient per upstream host, so every host gets its own
+# connection limits and keep-alive pool.
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """Get the shared async HTTP client for the host of `url`"""
+    key = _host_key(url)
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+        )
+        _clients[key] = client
+    return client
+
+
+def make_timeout(read: Optional[float] = None) -> httpx.Timeout:
+    """Build a per-request timeout that keeps the configured connect timeout"""
+    return httpx.Timeout(read or settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+
+async def close_http_clients():
+    """Close all pooled HTTP clients"""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+async def warm_http_clients(urls: Iterable[str]) -> int:
+    """
+    Open a connection to each host ahead of the first real request, so
+    DNS, TCP and TLS setup are paid at startup. Failures are ignored; the
+    first request simply connects as usual. Returns the hosts reached.
+    """
+    async def warm(url: str) -> bool:
+        try:
+            await get_http_client(url).head(_host_key(url), timeout=make_timeout(settings.HTTP_WARMUP_TIMEOUT))
+            return True
+        except httpx.HTTPError:
+            return False
+
+    results = await asyncio.gather(*(warm(url) for url in urls))
+    return sum(results)
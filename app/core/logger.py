@@ -0,0 +1,141 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+
+ROOT_LOGGER = "samakicash"
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is
+# emitted as a structured field.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as `time level logger message key=value ...` or as one JSON object per line"""
+    def __init__(self, json_output: bool = False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in vars(record).items() if key not in _RESERVED}
+        if self.json_output:
+            entry = {
+                "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                "level": record.levelname,
+                "logger": record.name,
+                "message": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc_info"] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+
+        line = (
+            f"{datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')} "
+            f"{record.levelname:<7} {record.name} {record.getMessage()}"
+        )
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Passes only a fraction of DEBUG/INFO records; warnings and errors always pass"""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking when the queue is full.
+
+    The stock prepare() formats every record on the calling thread; here
+    records are queued untouched and the listener does all formatting,
+    including merging the message with its args. Log values, not objects
+    the caller goes on to mutate.
+    """
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def _output_handler() -> logging.Handler:
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(StructuredFormatter(json_output=settings.LOG_FORMAT == "json"))
+    return output
+
+
+def setup_logging():
+    """
+    Configure the app logger for queued output; a no-op while it is active.
+
+    Records are filtered by level and sampling on the calling thread, then
+    handed untouched to a bounded queue; a background listener thread does
+    the formatting and writing, so request handlers never block on stdout.
+    Safe to call again after shutdown_logging() (a second lifespan).
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(settings.LOG_LEVEL)
+        root.handlers = [handler]
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, _output_handler(), respect_handler_level=False)
+        _listener.start()
+
+
+def shutdown_logging():
+    """
+    Flush queued records and stop the listener thread.
+
+    Logging keeps working afterwards, written directly on the calling
+    thread, until setup_logging() queues it again.
+    """
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        direct = _output_handler()
+        direct.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+        logging.getLogger(ROOT_LOGGER).handlers = [direct]
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger under the app namespace, e.g. get_logger("database")"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
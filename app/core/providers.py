@@ -0,0 +1,274 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import get_http_client, make_timeout
+from app.core.logger import get_logger
+
+logger = get_logger("providers")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Request priorities for rate-limited providers; lower goes first
+INTERACTIVE, BATCH = 0, 1
+
+# Priority of upstream calls made from the current request, e.g. set to BATCH by /api/match/batch
+request_priority: ContextVar[int] = ContextVar("request_priority", default=INTERACTIVE)
+
+
+class ProviderUnavailableError(Exception):
+    """The provider was not called; the caller should serve its fallback"""
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+class RateLimitedError(ProviderUnavailableError):
+    """Raised when no rate limit token became available within the allowed wait"""
+
+
+class TokenBucket:
+    """
+    Client-side rate limit: `rate` requests per second with bursts of `burst`.
+
+    Callers that find the bucket empty queue by (priority, arrival), so
+    interactive requests are admitted ahead of batch work, and give up
+    with RateLimitedError after `max_wait` seconds.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority: int, max_wait: float):
+        self._refill()
+        if self.tokens >= 1 and not self._waiters:
+            self.tokens -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(waiter, max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RateLimitedError(f"no rate limit token within {max_wait}s")
+
+    async def _dispatch(self):
+        """Hand out tokens to queued callers in priority order as they accrue"""
+        while self._waiters:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.tokens -= 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "queued": sum(1 for _, _, waiter in self._waiters if not waiter.done()),
+            "rejected": self.rejected,
+        }
+
+
+class Provider:
+    """
+    Guards calls to one external AI provider.
+
+    Keeps a rolling window of outcomes and latencies. When the error rate
+    over the window crosses BREAKER_ERROR_RATE the breaker opens and calls
+    fail fast with CircuitOpenError, so callers serve their fallback at
+    once. After BREAKER_OPEN_SECONDS a limited number of probe calls are
+    let through; a successful probe closes the breaker, a failed one opens
+    it again.
+
+    The read timeout adapts to the provider: the p95 latency of recent
+    successful calls times ADAPTIVE_TIMEOUT_MULTIPLIER, bounded by
+    ADAPTIVE_TIMEOUT_MIN and the call's configured maximum.
+
+    Admitted calls then take a token from the provider's TokenBucket, if
+    it has a rate limit configured.
+    """
+    def __init__(self, name: str, rate: float = 0, burst: float = 1):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+        self._window: Deque[Tuple[float, bool, float]] = deque()
+
+    def _trim(self, now: float):
+        cutoff = now - settings.BREAKER_WINDOW_SECONDS
+        while self._window and self._window[0][0] < cutoff:
+            self._window.popleft()
+
+    def _admit(self) -> bool:
+        """Whether this call is let through; False while the breaker is open"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < settings.BREAKER_OPEN_SECONDS:
+                return False
+            self.state = HALF_OPEN
+            logger.info("Circuit half-open, probing", extra={"provider": self.name})
+        if self.state == HALF_OPEN:
+            if self.probes >= settings.BREAKER_HALF_OPEN_PROBES:
+                return False
+            self.probes += 1
+        return True
+
+    def _record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self.probes = max(self.probes - 1, 0)
+            if ok:
+                self.state = CLOSED
+                self._window.clear()
+                logger.info("Circuit closed", extra={"provider": self.name})
+            else:
+                self._open(now)
+                return
+        self._window.append((now, ok, latency))
+        self._trim(now)
+        if self.state == CLOSED and len(self._window) >= settings.BREAKER_MIN_REQUESTS:
+            errors = sum(1 for _, success, _ in self._window if not success)
+            if errors / len(self._window) >= settings.BREAKER_ERROR_RATE:
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        logger.warning("Circuit opened", extra={"provider": self.name, "open_seconds": settings.BREAKER_OPEN_SECONDS})
+
+    def p95(self) -> Optional[float]:
+        latencies = sorted(latency for _, ok, latency in self._window if ok)
+        if len(latencies) < settings.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+
+    def timeout(self, max_timeout: Optional[float] = None) -> float:
+        """Read timeout for the next call"""
+        upper = max_timeout or settings.HTTP_TIMEOUT
+        p95 = self.p95()
+        if p95 is None:
+            return upper
+        return min(upper, max(settings.ADAPTIVE_TIMEOUT_MIN, p95 * settings.ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    @staticmethod
+    def _succeeded(response: httpx.Response) -> bool:
+        # 4xx other than 429 are our own bad requests, not provider health
+        return response.status_code < 500 and response.status_code != 429
+
+    async def _check(self):
+        if not self._admit():
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} circuit open")
+        if self.bucket is not None:
+            priority = request_priority.get()
+            max_wait = settings.RATE_LIMIT_MAX_WAIT_BATCH if priority == BATCH else settings.RATE_LIMIT_MAX_WAIT
+            try:
+                await self.bucket.acquire(priority, max_wait)
+            except BaseException:
+                # Not called after all: give back a half-open probe slot without recording an outcome
+                if self.state == HALF_OPEN:
+                    self.probes = max(self.probes - 1, 0)
+                raise
+
+    async def request(self, method: str, url: str, max_timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        """Send a request through the breaker and rate limiter with an adaptive read timeout"""
+        await self._check()
+        started = time.monotonic()
+        ok = False
+        try:
+            response = await get_http_client(url).request(
+                method, url, timeout=make_timeout(self.timeout(max_timeout)), **kwargs
+            )
+            ok = self._succeeded(response)
+            return response
+        finally:
+            self._record(ok, time.monotonic() - started)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, max_timeout: Optional[float] = None,
+                     **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """Streaming request; the latency sample is the time to response headers"""
+        await self._check()
+        started = time.monotonic()
+        latency = None
+        ok = False
+        try:
+            async with get_http_client(url).stream(
+                method, url, timeout=make_timeout(self.timeout(max_timeout)), **kwargs
+            ) as response:
+                latency = time.monotonic() - started
+                yield response
+                ok = self._succeeded(response)
+        finally:
+            self._record(ok, latency if latency is not None else time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        calls = len(self._window)
+        errors = sum(1 for _, ok, _ in self._window if not ok)
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(errors / calls, 4) if calls else 0.0,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "timeout_seconds": round(self.timeout(), 3),
+            "rejected": self.rejected,
+            "rate_limit": self.bucket.stats() if self.bucket is not None else None,
+        }
+
+
+_providers: Dict[str, Provider] = {}
+
+
+def get_provider(name: str) -> Provider:
+    """Get the shared guard for a provider, e.g. get_provider("mistral")"""
+    provider = _providers.get(name)
+    if provider is None:
+        prefix = name.upper()
+        provider = _providers[name] = Provider(
+            name,
+            rate=getattr(settings, f"{prefix}_RATE_LIMIT", 0),
+            burst=getattr(settings, f"{prefix}_RATE_BURST", 1),
+        )
+    return provider
+
+
+def provider_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: provider.stats() for name, provider in _providers.items()}
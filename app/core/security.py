@@ -0,0 +1,260 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger("security")
+
+SCRYPT_PREFIX = "scrypt"
+
+
+class CredentialsBusyError(Exception):
+    """Too many password hashes are pending; the caller should answer 503"""
+
+
+class InvalidTokenError(Exception):
+    """Access token is malformed, badly signed, expired or revoked"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+
+def _hash(password: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"{SCRYPT_PREFIX}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _parse(stored: str) -> Optional[Tuple[int, int, int, bytes, bytes]]:
+    """(n, r, p, salt, digest) of a stored scrypt hash; None for anything else (legacy plaintext)"""
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != SCRYPT_PREFIX:
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3]), base64.b64decode(parts[4]), base64.b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+def _verify(password: str, n: int, r: int, p: int, salt: bytes, digest: bytes) -> bool:
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), digest)
+
+
+class PasswordHasher:
+    """
+    scrypt password hashing off the event loop.
+
+    Hashes run on a small thread pool (hashlib.scrypt releases the GIL),
+    so a burst of logins costs worker threads rather than stalling every
+    other request. At most PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE
+    hashes are pending at once; beyond that calls fail fast with
+    CredentialsBusyError instead of queueing without bound.
+
+    Stored hashes carry their scrypt parameters, so raising SCRYPT_N
+    later only affects new hashes; verify() reports when a stored hash
+    (or a legacy plaintext password) should be replaced.
+    """
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.limit = workers + queue_size
+        self.pending = 0
+        self.rejected = 0
+        self.hashed = 0
+        self.verified = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dummy: Optional[Tuple[int, int, int, bytes, bytes]] = None
+
+    @property
+    def params(self) -> Tuple[int, int, int]:
+        return settings.SCRYPT_N, settings.SCRYPT_R, settings.SCRYPT_P
+
+    async def _submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.limit:
+            self.rejected += 1
+            logger.warning("Password hash queue full, rejecting", extra={"pending": self.pending})
+            raise CredentialsBusyError("too many pending password hashes")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the current scrypt parameters"""
+        result = await self._submit(_hash, password, *self.params)
+        self.hashed += 1
+        return result
+
+    async def verify(self, password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+        """
+        Check `password` against a stored hash; returns (valid, needs_rehash).
+
+        A missing user (`stored` None) still costs one hash, so response
+        times do not reveal which accounts exist.
+        """
+        self.verified += 1
+        parsed = _parse(stored) if stored else None
+        if parsed is None:
+            if stored is None:
+                await self._submit(_verify, password, *self._dummy_hash())
+                return False, False
+            # Legacy row written before hashing: compare, then upgrade it
+            valid = hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+            return valid, valid
+        valid = await self._submit(_verify, password, *parsed)
+        return valid, valid and parsed[:3] != self.params
+
+    def _dummy_hash(self) -> Tuple[int, int, int, bytes, bytes]:
+        if self._dummy is None or self._dummy[:3] != self.params:
+            self._dummy = (*self.params, os.urandom(16), os.urandom(32))
+        return self._dummy
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.limit,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "scrypt_n": settings.SCRYPT_N,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenAuthority:
+    """
+    Issues and verifies stateless access tokens: `payload.signature`, where
+    the payload is base64url JSON claims (sub, typ, iat, exp, jti) and the
+    signature is HMAC-SHA256 over it with SECRET_KEY.
+
+    Verifying needs no database: the signature and expiry say everything.
+    Tokens already verified are kept in an LRU cache, so repeat requests
+    skip decoding and the HMAC as well. Revoked tokens are remembered by
+    jti only until they would have expired anyway. The deny list is per
+    process; with several workers a revoked token stays valid on the
+    others until it expires.
+
+    Without a secret no tokens are issued or accepted, unless
+    `allow_random_key` (DEBUG) lets it sign with a per-process random key.
+    """
+    def __init__(self, secret: Optional[str], ttl: float, cache_size: int, allow_random_key: bool = False):
+        if not secret and allow_random_key:
+            logger.warning("SECRET_KEY not set, using a random key; tokens will not survive a restart")
+            secret = secrets.token_hex(32)
+        elif not secret:
+            logger.error("SECRET_KEY not set, access tokens are disabled")
+        self._key = secret.encode("utf-8") if secret else None
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._denied: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._key is not None
+
+    def _sign(self, payload: str) -> str:
+        return _b64url(hmac.new(self._key, payload.encode("utf-8"), hashlib.sha256).digest())
+
+    def issue(self, user_id: str, user_type: str) -> Tuple[str, Dict[str, Any]]:
+        """A new token for a user, with its claims"""
+        if not self.enabled:
+            raise RuntimeError("SECRET_KEY is not set, cannot issue access tokens")
+        now = int(time.time())
+        claims = {"sub": user_id, "typ": user_type, "iat": now, "exp": now + int(self.ttl), "jti": secrets.token_hex(8)}
+        payload = _b64url(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+        return f"{payload}.{self._sign(payload)}", claims
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        if not self.enabled:
+            raise InvalidTokenError("access tokens are disabled")
+        payload, _, signature = token.partition(".")
+        if not payload or not signature or not hmac.compare_digest(signature.encode("utf-8"), self._sign(payload).encode("utf-8")):
+            raise InvalidTokenError("bad signature")
+        try:
+            claims = json.loads(_b64url_decode(payload))
+        except ValueError:
+            raise InvalidTokenError("malformed token")
+        if not isinstance(claims, dict) or not {"sub", "exp", "jti"} <= set(claims):
+            raise InvalidTokenError("malformed token")
+        return claims
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises InvalidTokenError otherwise"""
+        claims = self._verified.get(token)
+        if claims is not None:
+            self.hits += 1
+            self._verified.move_to_end(token)
+        else:
+            self.misses += 1
+            try:
+                claims = self._decode(token)
+            except InvalidTokenError:
+                self.rejected += 1
+                raise
+        if claims["exp"] <= time.time() or claims["jti"] in self._denied:
+            self._verified.pop(token, None)
+            self.rejected += 1
+            raise InvalidTokenError("token expired or revoked")
+        if token not in self._verified:
+            self._verified[token] = claims
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+    def revoke(self, claims: Dict[str, Any]):
+        """Deny a token until its expiry"""
+        now = time.time()
+        self._denied = {jti: exp for jti, exp in self._denied.items() if exp > now}
+        self._denied[claims["jti"]] = claims["exp"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._verified),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "revoked": len(self._denied),
+        }
+
+
+token_authority = TokenAuthority(settings.SECRET_KEY, settings.ACCESS_TOKEN_TTL, settings.TOKEN_CACHE_SIZE,
+                                 allow_random_key=settings.DEBUG)
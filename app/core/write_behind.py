@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.logger import get_logger
+
+logger = get_logger("write_behind")
+
+
+def default_is_data_error(e: Exception) -> bool:
+    """Errors raised by the records themselves rather than by the store"""
+    return isinstance(e, (ValueError, TypeError, KeyError))
+
+
+class WriteBehindQueue:
+    """
+    Buffers records and writes them in batches off the request path.
+
+    A batch is flushed when it reaches `max_batch` records or when its
+    oldest record has waited `max_delay` seconds. The queue is bounded:
+    once `max_queue` records are pending, put() waits for the writer to
+    catch up, so a slow database pushes back on producers instead of
+    growing memory. close() flushes everything still buffered.
+
+    Failures are split by `is_data_error`. A data error (a bad record,
+    e.g. an unknown user_id) fails the whole batch transaction, so the
+    batch is written again record by record and only the records that fail
+    on their own are dropped. Anything else is treated as transient (the
+    database is down or overloaded): the batch is retried with exponential
+    backoff, capped at `max_backoff` seconds, until it goes through, while
+    the bounded queue holds producers back. Nothing is dropped for an
+    outage; after `retries` attempts the retries are logged as errors.
+    """
+    def __init__(self, flush: Callable[[List[Any]], Awaitable[Any]], max_batch: int, max_delay: float,
+                 max_queue: int, retries: int = 3, max_backoff: float = 30.0,
+                 is_data_error: Optional[Callable[[Exception], bool]] = None):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.retries = retries
+        self.max_backoff = max_backoff
+        self.is_data_error = is_data_error or default_is_data_error
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    async def put(self, record: Any):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        await self._queue.put(record)
+
+    async def _next_batch(self) -> List[Any]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: List[Any]):
+        attempt = 0
+        while True:
+            try:
+                await self.flush(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if self.is_data_error(e):
+                    break
+                level = logger.warning if attempt < self.retries else logger.error
+                level("Batch write failed, retrying: %s", e, extra={"records": len(batch), "attempt": attempt + 1})
+                await asyncio.sleep(min(self.max_backoff, 0.5 * 2 ** attempt))
+                attempt += 1
+        if len(batch) == 1:
+            self.dropped += 1
+            logger.error("Dropping record that could not be written", extra={"record": repr(batch[0])[:500]})
+            return
+        # A batch is one transaction, so a single bad record fails all of them:
+        # write the records one by one and drop only those that fail
+        logger.warning("Batch rejected, writing records one by one", extra={"records": len(batch)})
+        for record in batch:
+            await self._write([record])
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def close(self, timeout: Optional[float] = None):
+        """Flush every buffered record (waiting at most `timeout` seconds), then stop the writer"""
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error("Write-behind queue not flushed before shutdown", extra={"queued": self._queue.qsize()})
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "dropped": self.dropped,
+        }
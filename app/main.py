@@ -1,20 +1,132 @@
-from fastapi import FastAPI
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+import aiofiles.os
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from datetime import datetime
-import os
-import requests
+from typing import Dict, Optional
 
 from app.core.config import settings
-from app.core.database import init_db, close_db, get_db
+from app.core.database import init_db, close_db, get_db, catch_writer_stats, db_stats, USER_PUBLIC_COLUMNS
+from app.core.http_client import get_http_client, make_timeout, close_http_clients, warm_http_clients
+from app.core.providers import provider_stats
+from app.core.security import password_hasher, token_authority
+from app.core.logger import get_logger, setup_logging, shutdown_logging
 from app.api import auth, analyze, match, credit, users
+from app.services import voice_catalogue, audio_store, open_voice_stream
+from app.agents.voice_jobs import voice_jobs
+from app.agents.matchmaker import buyer_index
 from app.models import UserType
+from app.utils.pagination import list_response
+
+logger = get_logger("main")
+
+# Hosts of the AI providers, keyed by the setting that enables each one
+PROVIDER_HOSTS = {
+    "MISTRAL_API_KEY": "https://api.mistral.ai",
+    "AIML_API_KEY": "https://api.aimlapi.com",
+    "NEBIUS_API_KEY": "https://api.nebius.ai",
+    "ELEVENLABS_API_KEY": "https://api.elevenlabs.io",
+}
+
+SEED_PASSWORD = "Piuspe@9702"
+
+def seed_user_records(password_hashes):
+    """Test accounts created on an empty database, one password hash each"""
+    now = datetime.now()
+    accounts = [
+        ("elespius1.0@gmail.com", "+255700000001", UserType.FISHER, "Fisher User", None, "Mwanza"),
+        ("seller@samakicash.com", "+255700000002", UserType.SELLER, "Seller User", "Landing Site", "Dar es Salaam"),
+        ("buyer@samakicash.com", "+255700000003", UserType.BUYER, "Buyer User", "Lake Hotel", "Mwanza"),
+        ("superuser@samakicash.com", "+255700000000", UserType.SUPERUSER, "Super Admin", "SamakiCash", "HQ"),
+    ]
+    return [
+        {"id": str(uuid.uuid4()), "email": email, "phone": phone, "password_hash": password_hash, "user_type": user_type.value,
+         "name": name, "organization": organization, "location": location, "created_at": now}
+        for (email, phone, user_type, name, organization, location), password_hash in zip(accounts, password_hashes)
+    ]
+
+async def seed_users():
+    """Seed test users if none exist"""
+    try:
+        conn = await get_db()
+        if not await conn.has_users():
+            password_hashes = await asyncio.gather(*(password_hasher.hash(SEED_PASSWORD) for _ in range(4)))
+            await conn.insert_users(seed_user_records(password_hashes))
+            logger.info("Seeded 4 test users (fisher, seller, buyer, superuser)")
+    except Exception as e:
+        logger.warning("Seeding users failed: %s", e)
+
+async def warm_provider_clients() -> int:
+    """Connect to every configured AI provider"""
+    if not settings.HTTP_WARMUP:
+        return 0
+    return await warm_http_clients(url for key, url in PROVIDER_HOSTS.items() if getattr(settings, key))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup and shutdown.
+
+    The database (pool and schema) and the provider HTTP connections
+    are warmed concurrently; then test users are seeded
+    and the buyer index is built. /ready answers 503 until all of that is
+    done, and reports how long each step took.
+    """
+    setup_logging()
+    if settings.REQUIRE_AUTH and not token_authority.enabled:
+        raise RuntimeError("REQUIRE_AUTH is set but SECRET_KEY is not; no client could authenticate")
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    app.state.ready = False
+    app.state.startup = {"timings_ms": timings, "total_ms": None}
+
+    async def timed(name: str, awaitable):
+        step_started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[name] = round(1000 * (time.perf_counter() - step_started), 1)
+
+    _, warmed = await asyncio.gather(timed("database", init_db()), timed("http_clients", warm_provider_clients()))
+    await timed("seed_users", seed_users())
+    try:
+        await timed("buyer_index", buyer_index.refresh(force=True))
+    except Exception as e:
+        logger.warning("Building buyer index failed: %s", e)
+    voice_catalogue.start()
+    voice_jobs.start()
+
+    app.state.startup["total_ms"] = round(1000 * (time.perf_counter() - started), 1)
+    app.state.ready = True
+    logger.info("%s v%s started", settings.APP_NAME, settings.APP_VERSION, extra={
+        "database": "PostgreSQL" if not settings.USE_MEMORY_DB else "in-memory",
+        "startup_ms": app.state.startup["total_ms"],
+        "startup_timings_ms": timings,
+        "http_hosts_warmed": warmed,
+    })
+
+    yield
+
+    app.state.ready = False
+    await voice_jobs.stop()
+    await voice_catalogue.stop()
+    await close_db()
+    await close_http_clients()
+    password_hasher.shutdown()
+    logger.info("SamakiCash API shutdown complete")
+    shutdown_logging()
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="SamakiCash - AI-powered fish market platform for Tanzania"
+    description="SamakiCash - AI-powered fish market platform for Tanzania",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend connection
@@ -33,51 +145,6 @@ app.include_router(match.router, prefix="/api", tags=["Matchmaking"])
 app.include_router(credit.router, prefix="/api", tags=["Financial Services"])
 app.include_router(users.router, prefix="/api", tags=["Users"])
 
-# Startup and shutdown events
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database on startup"""
-    await init_db()
-    print(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} started successfully!")
-    print(f"📊 Using {'PostgreSQL' if not settings.USE_MEMORY_DB else 'in-memory'} database")
-    # Seed test users if none exist
-    try:
-        conn = await get_db()
-        existing = await conn.fetch("SELECT * FROM users")
-        if not existing:
-            import uuid
-            from datetime import datetime
-            password = "Piuspe@9702"
-            # Fisher
-            await conn.execute(
-                "INSERT INTO users (id, email, phone, password_hash, user_type, name, organization, location, created_at) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)",
-                str(uuid.uuid4()), "elespius1.0@gmail.com", "+255700000001", password, UserType.FISHER.value, "Fisher User", None, "Mwanza", datetime.now()
-            )
-            # Seller
-            await conn.execute(
-                "INSERT INTO users (id, email, phone, password_hash, user_type, name, organization, location, created_at) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)",
-                str(uuid.uuid4()), "elespius1.0@gmail.com", "+255700000002", password, UserType.SELLER.value, "Seller User", "Landing Site", "Dar es Salaam", datetime.now()
-            )
-            # Buyer
-            await conn.execute(
-                "INSERT INTO users (id, email, phone, password_hash, user_type, name, organization, location, created_at) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)",
-                str(uuid.uuid4()), "elespius1.0@gmail.com", "+255700000003", password, UserType.BUYER.value, "Buyer User", "Lake Hotel", "Mwanza", datetime.now()
-            )
-            # Superuser
-            await conn.execute(
-                "INSERT INTO users (id, email, phone, password_hash, user_type, name, organization, location, created_at) VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9)",
-                str(uuid.uuid4()), "superuser@samakicash.com", "+255700000000", password, UserType.SUPERUSER.value, "Super Admin", "SamakiCash", "HQ", datetime.now()
-            )
-            print("👤 Seeded 4 test users (fisher, seller, buyer, superuser)")
-    except Exception as e:
-        print(f"Seeding users failed: {e}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Clean up on shutdown"""
-    await close_db()
-    print("👋 SamakiCash API shutdown complete")
-
 # Health check endpoints
 @app.get("/")
 async def root():
@@ -98,36 +165,100 @@ async def health_check():
         "version": settings.APP_VERSION
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup has finished or while the database is unreachable"""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        db = await get_db()
+        await asyncio.wait_for(db.ping(), 2)
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        return JSONResponse({"status": "unavailable", "reason": "database"}, status_code=503)
+    return {"status": "ready", "startup": app.state.startup}
+
 # Audio file serving
-@app.get("/audio/{filename}")
-async def get_audio(filename: str):
-    """Serve generated audio files"""
-    if os.path.exists(filename) and not filename.startswith("error:"):
-        return FileResponse(filename)
-    return {"status": "error", "message": "Audio file not found"}
+@app.get("/audio/jobs/{job_id}")
+async def get_audio_job(job_id: str):
+    """Voice job status; redirects to the audio file once it is ready"""
+    job = voice_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Voice job not found")
+    if job.status == "done":
+        return RedirectResponse(f"/audio/{job.filename}", status_code=303)
+    return JSONResponse(job.to_dict(), status_code=202 if job.status in ("queued", "running") else 200)
+
+@app.get("/audio/jobs/{job_id}/stream")
+async def stream_audio_job(job_id: str):
+    """
+    Play a voice message while it is still being synthesized.
+
+    Starts synthesis right away if the job is still queued; every client
+    of the same message shares one upstream TTS stream, which is also
+    written to the audio store.
+    """
+    job = voice_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Voice job not found")
+    if job.status == "done":
+        return RedirectResponse(f"/audio/{job.filename}", status_code=303)
+    if job.status == "failed":
+        return JSONResponse(job.to_dict(), status_code=502)
+
+    filename, broadcast = await open_voice_stream(job.price_data, job.market_data)
+    if filename:
+        return RedirectResponse(f"/audio/{filename}", status_code=303)
+    if broadcast is not None:
+        await broadcast.ready()
+        if broadcast.chunks:
+            return StreamingResponse(broadcast.subscribe(), media_type="audio/mpeg",
+                                     headers={"Cache-Control": "no-store"})
+    return JSONResponse({**job.to_dict(), "status": "failed"}, status_code=502)
+
+@app.api_route("/audio/{filename}", methods=["GET", "HEAD"])
+async def get_audio(filename: str, request: Request):
+    """
+    Serve generated audio files.
+
+    The name addresses the message (model, voice, text), not the bytes:
+    TTS output differs between runs, so a file evicted and synthesized
+    again has new content under the same name. The strong ETag therefore
+    comes from the stored file (size and modification time), which
+    changes on every commit, and the response is not marked immutable.
+    FileResponse handles Range/If-Range (resumable playback) against that
+    ETag and uses the ASGI pathsend extension when the server offers it.
+    """
+    path = audio_store.path(filename)
+    try:
+        stat = await aiofiles.os.stat(path) if path else None
+    except FileNotFoundError:
+        stat = None
+    if stat:
+        etag = f'"{filename[:16]}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, media_type="audio/mpeg", headers=headers)
+    return JSONResponse({"status": "error", "message": "Audio file not found"}, status_code=404)
 
 # User management endpoints
 @app.get("/api/users/buyers")
-async def list_buyers():
-    """List all buyer users"""
-    from app.core.database import get_db
-    from app.models import UserType
-    
+async def list_buyers(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                      format: str = Query("json", pattern="^(json|ndjson)$")):
+    """List buyer users, newest first (cursor-paginated, or format=ndjson to stream)"""
     conn = await get_db()
-    users = await conn.fetch("SELECT * FROM users")
-    buyers = [u for u in users if u.get("user_type") == UserType.BUYER.value]
-    return {"count": len(buyers), "buyers": buyers}
+    return await list_response(conn, "users", {"user_type": [UserType.BUYER.value]}, "buyers",
+                               limit, cursor, format, columns=USER_PUBLIC_COLUMNS)
 
 @app.get("/api/users/sellers")
-async def list_sellers():
-    """List all seller users"""
-    from app.core.database import get_db
-    from app.models import UserType
-    
+async def list_sellers(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                       format: str = Query("json", pattern="^(json|ndjson)$")):
+    """List seller and fisher users, newest first (cursor-paginated, or format=ndjson to stream)"""
     conn = await get_db()
-    users = await conn.fetch("SELECT * FROM users")
-    sellers = [u for u in users if u.get("user_type") in (UserType.SELLER.value, UserType.FISHER.value)]
-    return {"count": len(sellers), "sellers": sellers}
+    return await list_response(conn, "users", {"user_type": [UserType.SELLER.value, UserType.FISHER.value]}, "sellers",
+                               limit, cursor, format, columns=USER_PUBLIC_COLUMNS)
 
 # Debug endpoints
 @app.get("/api/debug/elevenlabs")
@@ -137,13 +268,15 @@ async def debug_elevenlabs():
     
     try:
         headers = {"xi-api-key": api_key} if api_key else {}
-        response = requests.get("https://api.elevenlabs.io/v1/voices", headers=headers, timeout=10)
+        url = "https://api.elevenlabs.io/v1/voices"
+        response = await get_http_client(url).get(url, headers=headers, timeout=make_timeout(10))
         
         return {
             "has_api_key": bool(api_key),
             "api_key_valid": api_key and api_key.startswith("sk-"),
             "api_connection": response.status_code == 200,
             "voices_available": len(response.json().get('voices', [])) if response.status_code == 200 else 0,
+            "voice_catalogue": voice_catalogue.status(),
             "message": "Check your ELEVENLABS_API_KEY in .env file" if not api_key else "API key found"
         }
     except Exception as e:
@@ -154,23 +287,54 @@ async def debug_elevenlabs():
             "error": str(e)
         }
 
+@app.get("/api/debug/cache")
+async def debug_cache():
+    """Debug endpoint to inspect AI response and audio cache hit rates"""
+    from app.services import price_cache, insights_cache
+    from app.services.mistral_service import price_flight
+    from app.services.aiml_service import insights_flight
+    from app.services.nebius_service import image_flight
+
+    return {
+        "price_analysis": price_cache.stats(),
+        "market_insights": insights_cache.stats(),
+        "audio": audio_store.stats(),
+        "voice_jobs": voice_jobs.stats(),
+        "coalesced_requests": {
+            "price_analysis": price_flight.stats(),
+            "market_insights": insights_flight.stats(),
+            "image_analysis": image_flight.stats(),
+        },
+    }
+
+@app.get("/api/debug/providers")
+async def debug_providers():
+    """Debug endpoint to inspect circuit breaker state and adaptive timeouts per AI provider"""
+    return provider_stats()
+
+@app.get("/api/debug/auth")
+async def debug_auth():
+    """Debug endpoint to inspect the password hashing pool and the verified-token cache"""
+    return {"password_hasher": password_hasher.stats(), "tokens": token_authority.stats()}
+
+@app.get("/api/debug/db")
+async def debug_db():
+    """Debug endpoint to inspect the connection pool, statement timings and write buffers"""
+    return {"pool": db_stats(), "catch_writer": catch_writer_stats()}
+
 @app.get("/api/debug/users")
-async def debug_users():
-    """Debug endpoint to list all users"""
-    from app.core.database import get_db
-    
+async def debug_users(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                      format: str = Query("json", pattern="^(json|ndjson)$")):
+    """Debug endpoint to list users (cursor-paginated, or format=ndjson to stream)"""
     conn = await get_db()
-    users = await conn.fetch("SELECT * FROM users")
-    return {"users": users}
+    return await list_response(conn, "users", {}, "users", limit, cursor, format, columns=USER_PUBLIC_COLUMNS)
 
 @app.get("/api/debug/catches")
-async def debug_catches():
-    """Debug endpoint to list all catches"""
-    from app.core.database import get_db
-    
+async def debug_catches(limit: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+                        format: str = Query("json", pattern="^(json|ndjson)$")):
+    """Debug endpoint to list catches (cursor-paginated, or format=ndjson to stream)"""
     conn = await get_db()
-    catches = await conn.fetch("SELECT * FROM catches")
-    return {"catches": catches}
+    return await list_response(conn, "catches", {}, "catches", limit, cursor, format)
 
 if __name__ == "__main__":
     import uvicorn
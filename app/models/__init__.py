@@ -1,6 +1,6 @@
 from .user import UserCreate, LoginRequest, UserType
 from .catch import FishCatchRequest
-from .financial import LoanApplication, InsuranceQuoteRequest, MatchRequest
+from .financial import LoanApplication, InsuranceQuoteRequest, MatchRequest, BatchMatchRequest
 
 __all__ = [
     "UserCreate",
@@ -9,5 +9,6 @@ __all__ = [
     "FishCatchRequest",
     "LoanApplication",
     "InsuranceQuoteRequest",
-    "MatchRequest"
+    "MatchRequest",
+    "BatchMatchRequest"
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 
 class LoanApplication(BaseModel):
     user_id: str
@@ -16,3 +16,7 @@ class MatchRequest(BaseModel):
     quantity_kg: float
     location: str
     user_id: Optional[str] = None
+
+class BatchMatchRequest(BaseModel):
+    offers: List[MatchRequest] = Field(..., min_length=1, max_length=500)
+    top_k: int = Field(default=10, ge=1, le=50)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class UserType(str, Enum):
@@ -16,6 +16,8 @@ class UserCreate(BaseModel):
     name: Optional[str] = None
     organization: Optional[str] = None  # useful for buyers
     location: Optional[str] = None
+    preferred_fish_types: Optional[List[str]] = None  # buyers: species they purchase
+    capacity_kg: Optional[float] = None  # buyers: how much they can take per purchase
 
 class LoginRequest(BaseModel):
     email: Optional[str] = None
@@ -1,11 +1,16 @@
-from .mistral_service import call_mistral_ai
-from .aiml_service import call_aiml_api
+from .mistral_service import call_mistral_ai, price_cache
+from .aiml_service import call_aiml_api, insights_cache
 from .nebius_service import call_nebius_ai
-from .elevenlabs_service import call_elevenlabs
+from .elevenlabs_service import call_elevenlabs, open_voice_stream, voice_catalogue, audio_store
 
 __all__ = [
     "call_mistral_ai",
-    "call_aiml_api", 
+    "price_cache",
+    "call_aiml_api",
+    "insights_cache",
     "call_nebius_ai",
-    "call_elevenlabs"
+    "call_elevenlabs",
+    "open_voice_stream",
+    "voice_catalogue",
+    "audio_store"
 ]
\ No newline at end of file
@@ -1,45 +1,91 @@
 import os
-import requests
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.core.config import settings
+from app.core.providers import get_provider
+from app.utils.cache import TTLCache
+from app.utils.singleflight import SingleFlight
+from app.core.logger import get_logger
 
-async def call_aiml_api(context: Dict[str, Any]) -> Dict[str, Any]:
-    """Call AI/ML API for market insights"""
+logger = get_logger("services.aiml")
+
+# The insights prompt depends only on species and place, so one answer serves every catch in that market
+insights_cache = TTLCache(
+    maxsize=settings.INSIGHTS_CACHE_MAX_ENTRIES,
+    ttl=settings.INSIGHTS_CACHE_TTL,
+    stale_ttl=settings.INSIGHTS_CACHE_STALE_TTL
+)
+
+# Concurrent misses and refreshes for one key share a single upstream request
+insights_flight = SingleFlight()
+
+def insights_cache_key(context: Dict[str, Any]) -> str:
+    """Cache key for market insights: species and place"""
+    fish_type = " ".join(str(context.get('fish_type') or 'unknown').lower().split())
+    location = " ".join(str(context.get('location') or 'unknown').lower().split())
+    return f"insights:{fish_type}:{location}"
+
+async def _request_insights(context: Dict[str, Any]) -> Dict[str, Any]:
     api_key = settings.AIML_API_KEY
-    
+
     prompt = f"""
     Provide market insights for fish trading in Tanzania:
     Fish: {context.get('fish_type')}
     Location: {context.get('location')}
-    
+
     Include: demand trends, competitor prices, recommendations.
     Format as JSON with: market_trend, competitor_analysis, recommendation
     """
-    
+
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
-    
+
     payload = {
         "model": "gpt-4",
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.3
     }
-    
+
+    url = "https://api.aimlapi.com/v1/chat/completions"
+    response = await get_provider("aiml").post(
+        url,
+        json=payload,
+        headers=headers
+    )
+    response.raise_for_status()
+    return response.json()
+
+async def _refresh_insights(key: str, context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Fetch insights and cache them; None when the upstream call fails"""
     try:
-        response = requests.post(
-            "https://api.aimlapi.com/v1/chat/completions",
-            json=payload,
-            headers=headers,
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()
+        insights = await _request_insights(context)
     except Exception as e:
-        print(f"AI/ML API error: {e}")
-        return {
-            "market_trend": "Growing demand",
-            "competitor_analysis": "Average price: 4000-6000 TZS/kg",
-            "recommendation": "Sell in morning for best prices"
-        }
+        logger.warning("AI/ML API error: %s", e)
+        return None
+    insights_cache.set(key, insights)
+    return insights
+
+async def call_aiml_api(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Call AI/ML API for market insights, served from insights_cache when possible.
+
+    Expired entries are still served during INSIGHTS_CACHE_STALE_TTL while
+    one background request refreshes them.
+    """
+    key = insights_cache_key(context)
+    cached = insights_cache.get_stale(key)
+    if cached is not None:
+        insights, fresh = cached
+        if not fresh:
+            insights_flight.start(key, lambda: _refresh_insights(key, context))
+        return dict(insights)
+
+    insights = await insights_flight.do(key, lambda: _refresh_insights(key, context))
+    if insights is not None:
+        return dict(insights)
+    return {
+        "market_trend": "Growing demand",
+        "competitor_analysis": "Average price: 4000-6000 TZS/kg",
+        "recommendation": "Sell in morning for best prices"
+    }
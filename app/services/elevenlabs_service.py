@@ -1,101 +1,260 @@
-import os
-import uuid
-import requests
-from typing import Dict, Any
+import asyncio
+import time
+import aiofiles
+import aiofiles.os
+import httpx
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
+from app.core.providers import ProviderUnavailableError, get_provider
+from app.core.logger import get_logger
+from app.utils.audio_store import AudioBroadcast, AudioStore, audio_key
 
-async def call_elevenlabs(price_data: Dict[str, Any], market_data: Dict[str, Any]) -> str:
-    """Generate voice message using ElevenLabs"""
+logger = get_logger("services.elevenlabs")
+
+ELEVENLABS_API = "https://api.elevenlabs.io/v1"
+TTS_MODEL_ID = "eleven_multilingual_v2"
+
+audio_store = AudioStore(settings.AUDIO_DIR, settings.AUDIO_CACHE_MAX_BYTES)
+
+# Syntheses in progress by content key, so concurrent requests for one message share a stream
+_live_streams: Dict[str, AudioBroadcast] = {}
+
+
+def voice_enabled() -> bool:
+    """Whether voice messages can be generated at all (a valid API key is configured)"""
     api_key = settings.ELEVENLABS_API_KEY
-    
-    # If no API key or invalid format, skip gracefully
-    if not api_key or not api_key.startswith("sk-"):
-        print("ElevenLabs API key not configured or invalid - skipping voice generation")
-        return "voice_generation_skipped"
-    
-    try:
-        headers = {
-            "xi-api-key": api_key,
-            "Content-Type": "application/json",
-            "Accept": "audio/mpeg"
+    return bool(api_key) and api_key.startswith("sk-")
+
+
+def choose_voice(voices: List[Dict[str, Any]]) -> Optional[str]:
+    """Prefer Bella or a multilingual voice, otherwise the first one in the account"""
+    for voice in voices:
+        if voice.get('name') == 'Bella' or 'multilingual' in (voice.get('description') or '').lower():
+            return voice.get('voice_id')
+    return voices[0].get('voice_id') if voices else None
+
+
+class VoiceCatalogue:
+    """
+    Cached copy of the account's voice list and the voice chosen from it.
+
+    ELEVENLABS_VOICE_ID pins the voice and skips the catalogue entirely;
+    otherwise the list is fetched once at startup and refreshed in the
+    background every ELEVENLABS_VOICES_TTL seconds, so synthesis never
+    waits on GET /voices.
+    """
+    def __init__(self):
+        self.voices: List[Dict[str, Any]] = []
+        self.voice_id: Optional[str] = None
+        self.fetched_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_stale(self) -> bool:
+        return self.fetched_at is None or time.monotonic() - self.fetched_at > settings.ELEVENLABS_VOICES_TTL
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Fetch the voice list if stale; keeps the previous selection when the fetch fails"""
+        if not force and not self.is_stale():
+            return True
+        async with self._lock:
+            if not force and not self.is_stale():
+                return True
+            try:
+                response = await get_provider("elevenlabs").get(
+                    f"{ELEVENLABS_API}/voices",
+                    headers={"xi-api-key": settings.ELEVENLABS_API_KEY},
+                    max_timeout=30
+                )
+                if response.status_code != 200:
+                    logger.warning("Voice fetch failed: %s - %s", response.status_code, response.text[:200])
+                    return False
+                voices = response.json().get('voices', [])
+            except (httpx.HTTPError, ProviderUnavailableError) as e:
+                logger.warning("Voice fetch failed: %s", e)
+                return False
+
+            if not voices:
+                logger.warning("No voices available in ElevenLabs account")
+                return False
+            self.voices = voices
+            self.voice_id = choose_voice(voices)
+            self.fetched_at = time.monotonic()
+            logger.info("Voice catalogue refreshed", extra={"voices": len(voices), "voice_id": self.voice_id})
+            return True
+
+    def current_voice_id(self) -> Optional[str]:
+        """The pinned or selected voice without waiting for a fetch"""
+        return settings.ELEVENLABS_VOICE_ID or self.voice_id
+
+    async def get_voice_id(self) -> Optional[str]:
+        if settings.ELEVENLABS_VOICE_ID:
+            return settings.ELEVENLABS_VOICE_ID
+        # Only the first call before the startup fetch completes waits here;
+        # after that a stale list is served while the background task renews it
+        if self.voice_id is None:
+            await self.refresh()
+        return self.voice_id
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh(force=True)
+            await asyncio.sleep(settings.ELEVENLABS_VOICES_TTL)
+
+    def start(self):
+        """Select the voice and keep the catalogue fresh in the background"""
+        if settings.ELEVENLABS_VOICE_ID or not voice_enabled() or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pinned": bool(settings.ELEVENLABS_VOICE_ID),
+            "voice_id": settings.ELEVENLABS_VOICE_ID or self.voice_id,
+            "voices_cached": len(self.voices),
+            "age_seconds": round(time.monotonic() - self.fetched_at, 1) if self.fetched_at is not None else None,
         }
-        
-        # Create a clear, concise message in Swahili
-        message = f"""
-        Habari! SamakiCash hapa. 
-        Bei ya soko ya {price_data.get('fish_type', 'samaki')} ni TZS {price_data.get('fair_price', 0)} kwa kilo.
-        Sababu: {price_data.get('reasoning', 'mahitaji ya soko')}.
-        Ushauri: {market_data.get('recommendation', 'nunua kwa bei nzuri')}.
-        Asante na kwa heri!
-        """
-        
-        # Clean up the message
-        message = " ".join(message.split())  # Remove extra whitespace
-        
-        # Get available voices
-        voices_response = requests.get(
-            "https://api.elevenlabs.io/v1/voices",
-            headers=headers,
-            timeout=30
-        )
-        
-        if voices_response.status_code != 200:
-            print(f"Voice fetch failed: {voices_response.status_code} - {voices_response.text}")
-            return "voice_generation_failed"
-        
-        voices = voices_response.json().get('voices', [])
-        if not voices:
-            print("No voices available in ElevenLabs account")
-            return "voice_generation_failed"
-        
-        # Try to find a suitable voice (prefer multilingual voices)
-        voice_id = None
-        for voice in voices:
-            if voice.get('name') == 'Bella' or 'multilingual' in voice.get('description', '').lower():
-                voice_id = voice.get('voice_id')
-                break
-        
-        # Fallback to first available voice
-        if not voice_id and voices:
-            voice_id = voices[0]['voice_id']
-        
-        if not voice_id:
-            print("No valid voice ID found")
-            return "voice_generation_failed"
-        
-        print(f"Using voice ID: {voice_id}")
-        
-        # Generate speech
-        response = requests.post(
-            f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
+
+
+voice_catalogue = VoiceCatalogue()
+
+
+def build_voice_message(price_data: Dict[str, Any], market_data: Dict[str, Any]) -> str:
+    """Create a clear, concise price alert in Swahili"""
+    message = f"""
+    Habari! SamakiCash hapa. 
+    Bei ya soko ya {price_data.get('fish_type', 'samaki')} ni TZS {price_data.get('fair_price', 0)} kwa kilo.
+    Sababu: {price_data.get('reasoning', 'mahitaji ya soko')}.
+    Ushauri: {market_data.get('recommendation', 'nunua kwa bei nzuri')}.
+    Asante na kwa heri!
+    """
+    return " ".join(message.split())  # Remove extra whitespace
+
+
+def cached_voice_message(price_data: Dict[str, Any], market_data: Dict[str, Any]) -> Optional[str]:
+    """Filename of an already synthesized message for this alert, without calling the API"""
+    voice_id = voice_catalogue.current_voice_id()
+    if not voice_enabled() or not voice_id:
+        return None
+    key = audio_key(build_voice_message(price_data, market_data), voice_id, TTS_MODEL_ID)
+    return audio_store.get(key, record_miss=False)
+
+
+async def _synthesize(broadcast: AudioBroadcast, key: str, voice_id: str, message: str):
+    """Stream speech from ElevenLabs into `broadcast` while teeing it into the audio store"""
+    filename = f"{key}.mp3"
+    tmp_path = audio_store.temp_path(filename)
+    size = 0
+    try:
+        async with get_provider("elevenlabs").stream(
+            "POST",
+            f"{ELEVENLABS_API}/text-to-speech/{voice_id}/stream",
             json={
                 "text": message,
-                "model_id": "eleven_multilingual_v2",
+                "model_id": TTS_MODEL_ID,
                 "voice_settings": {
                     "stability": 0.5,
                     "similarity_boost": 0.75
                 }
             },
-            headers=headers,
-            timeout=45
-        )
-        
-        if response.status_code == 200:
-            filename = f"price_alert_{uuid.uuid4().hex[:8]}.mp3"
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            print(f"Voice message saved as: {filename}")
+            headers={
+                "xi-api-key": settings.ELEVENLABS_API_KEY,
+                "Content-Type": "application/json",
+                "Accept": "audio/mpeg"
+            },
+            max_timeout=45
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.warning("Speech generation failed: %s - %s", response.status_code, body[:200].decode(errors='replace'))
+                await broadcast.finish(error="voice_generation_failed")
+                return
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    await f.write(chunk)
+                    size += len(chunk)
+                    await broadcast.publish(chunk)
+        await audio_store.commit(tmp_path, filename, size)
+        logger.info("Voice message saved", extra={"audio_file": filename})
+        await broadcast.finish(filename=filename)
+    except httpx.TimeoutException:
+        logger.warning("ElevenLabs API timeout - voice generation took too long")
+        await broadcast.finish(error="voice_generation_timeout")
+    except httpx.TransportError:
+        logger.warning("ElevenLabs connection error - check internet connection")
+        await broadcast.finish(error="voice_connection_error")
+    except ProviderUnavailableError as e:
+        logger.warning("ElevenLabs unavailable - skipping voice generation: %s", e)
+        await broadcast.finish(error="voice_generation_failed")
+    except Exception as e:
+        logger.error("ElevenLabs unexpected error: %s", e)
+        await broadcast.finish(error="voice_generation_failed")
+    finally:
+        _live_streams.pop(key, None)
+        if not broadcast.filename:
+            try:
+                await aiofiles.os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+
+async def open_voice_stream(price_data: Dict[str, Any], market_data: Dict[str, Any]) -> Tuple[Optional[str], Optional[AudioBroadcast]]:
+    """
+    Start synthesizing a voice message, or join the synthesis already in
+    progress for the same message.
+
+    Returns (filename, None) when the message is already stored,
+    (None, broadcast) while it is being synthesized and (None, None) when
+    voice generation is unavailable.
+    """
+    if not voice_enabled():
+        return None, None
+    voice_id = await voice_catalogue.get_voice_id()
+    if not voice_id:
+        logger.warning("No valid voice ID found")
+        return None, None
+    logger.debug("Using voice", extra={"voice_id": voice_id})
+
+    message = build_voice_message(price_data, market_data)
+    key = audio_key(message, voice_id, TTS_MODEL_ID)
+    live = _live_streams.get(key)
+    if live is not None:
+        return None, live
+    # Identical messages are synthesized once and then served from the store
+    cached = audio_store.get(key)
+    if cached:
+        logger.debug("Voice message served from cache", extra={"audio_file": cached})
+        return cached, None
+
+    broadcast = AudioBroadcast()
+    _live_streams[key] = broadcast
+    broadcast.task = asyncio.create_task(_synthesize(broadcast, key, voice_id, message))
+    return None, broadcast
+
+
+async def call_elevenlabs(price_data: Dict[str, Any], market_data: Dict[str, Any]) -> str:
+    """Generate voice message using ElevenLabs"""
+    # If no API key or invalid format, skip gracefully
+    if not voice_enabled():
+        logger.debug("ElevenLabs API key not configured or invalid - skipping voice generation")
+        return "voice_generation_skipped"
+    
+    try:
+        filename, broadcast = await open_voice_stream(price_data, market_data)
+        if filename:
             return filename
-        else:
-            print(f"Speech generation failed: {response.status_code} - {response.text}")
+        if broadcast is None:
             return "voice_generation_failed"
-            
-    except requests.exceptions.Timeout:
-        print("ElevenLabs API timeout - voice generation took too long")
-        return "voice_generation_timeout"
-    except requests.exceptions.ConnectionError:
-        print("ElevenLabs connection error - check internet connection")
-        return "voice_connection_error"
+        return await broadcast.wait()
     except Exception as e:
-        print(f"ElevenLabs unexpected error: {str(e)}")
+        logger.error("ElevenLabs unexpected error: %s", e)
         return "voice_generation_failed"
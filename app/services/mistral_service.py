@@ -1,17 +1,61 @@
 import os
 import json
-import requests
 from typing import Dict, Any
 from app.core.config import settings
+from app.core.providers import get_provider
+from app.utils.cache import TTLCache, SQLiteCacheBackend
+from app.utils.singleflight import SingleFlight
+from app.core.logger import get_logger
+
+logger = get_logger("services.mistral")
+
+# Upper bounds (kg) of the quantity bands that share a cached price analysis
+QUANTITY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000)
+
+price_cache = TTLCache(
+    maxsize=settings.PRICE_CACHE_MAX_ENTRIES,
+    ttl=settings.PRICE_CACHE_TTL,
+    backend=SQLiteCacheBackend(settings.PRICE_CACHE_PATH) if settings.PRICE_CACHE_PATH else None
+)
+
+# Concurrent cache misses for one key share a single upstream request
+price_flight = SingleFlight()
+
+def quantity_bucket(quantity_kg: Any) -> str:
+    """Map a quantity to its band label, e.g. 30 -> '25-50'"""
+    try:
+        quantity = float(quantity_kg or 0)
+    except (TypeError, ValueError):
+        quantity = 0.0
+    lower = 0
+    for upper in QUANTITY_BUCKETS:
+        if quantity < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+def price_cache_key(context: Dict[str, Any]) -> str:
+    """Cache key for a price analysis: species, place and quantity band"""
+    fish_type = " ".join(str(context.get('fish_type') or 'unknown').lower().split())
+    location = " ".join(str(context.get('location') or 'unknown').lower().split())
+    return f"price:{fish_type}:{location}:{quantity_bucket(context.get('quantity_kg'))}"
 
 def validate_api_key(api_key: str, service: str):
     """Validate API key format"""
     if not api_key or not api_key.startswith("sk-"):
-        print(f"Warning: Invalid {service} API key format")
+        logger.warning("Invalid %s API key format", service)
     return True
 
 async def call_mistral_ai(context: Dict[str, Any]) -> Dict[str, Any]:
-    """Call Mistral AI for price analysis"""
+    """Call Mistral AI for price analysis, served from price_cache when possible"""
+    cache_key = price_cache_key(context)
+    cached = await price_cache.aget(cache_key)
+    if cached is not None:
+        return dict(cached)
+    price_analysis = await price_flight.do(cache_key, lambda: _request_price(cache_key, context))
+    return dict(price_analysis) if isinstance(price_analysis, dict) else price_analysis
+
+async def _request_price(cache_key: str, context: Dict[str, Any]) -> Dict[str, Any]:
     api_key = settings.MISTRAL_API_KEY
     validate_api_key(api_key, "Mistral AI")
     
@@ -38,17 +82,20 @@ async def call_mistral_ai(context: Dict[str, Any]) -> Dict[str, Any]:
     }
     
     try:
-        response = requests.post(
-            "https://api.mistral.ai/v1/chat/completions",
+        url = "https://api.mistral.ai/v1/chat/completions"
+        response = await get_provider("mistral").post(
+            url,
             json=payload,
-            headers=headers,
-            timeout=30
+            headers=headers
         )
         response.raise_for_status()
         result = response.json()
-        return json.loads(result['choices'][0]['message']['content'])
+        price_analysis = json.loads(result['choices'][0]['message']['content'])
+        if isinstance(price_analysis, dict):
+            price_cache.set(cache_key, price_analysis)
+        return price_analysis
     except Exception as e:
-        print(f"Mistral AI error: {e}")
+        logger.warning("Mistral AI error: %s", e)
         return {
             "fair_price": 5200,
             "currency": "TZS",
@@ -1,15 +1,28 @@
+import hashlib
 import os
-import requests
 from typing import Dict, Any, Optional
 from app.core.config import settings
+from app.core.providers import get_provider
+from app.utils.singleflight import SingleFlight
+from app.core.logger import get_logger
+
+logger = get_logger("services.nebius")
+
+# The same photo submitted concurrently (client retries, double taps) is analyzed once
+image_flight = SingleFlight()
 
 async def call_nebius_ai(image_data: Optional[str] = None) -> Dict[str, Any]:
     """Call Nebius AI for image analysis"""
-    api_key = settings.NEBIUS_API_KEY
-    
     if not image_data:
         return {"analysis": "No image provided"}
     
+    key = hashlib.sha256(image_data.encode()).hexdigest()
+    result = await image_flight.do(key, lambda: _request_image_analysis(image_data))
+    return dict(result) if isinstance(result, dict) else result
+
+async def _request_image_analysis(image_data: str) -> Dict[str, Any]:
+    api_key = settings.NEBIUS_API_KEY
+    
     try:
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -23,16 +36,16 @@ async def call_nebius_ai(image_data: Optional[str] = None) -> Dict[str, Any]:
             "tasks": ["quality_assessment"]
         }
         
-        response = requests.post(
-            "https://api.nebius.ai/v1/vision/analyze",
+        url = "https://api.nebius.ai/v1/vision/analyze"
+        response = await get_provider("nebius").post(
+            url,
             json=payload,
-            headers=headers,
-            timeout=30
+            headers=headers
         )
         response.raise_for_status()
         return response.json()
     except Exception as e:
-        print(f"Nebius AI error: {e}")
+        logger.warning("Nebius AI error: %s", e)
         return {
             "quality_assessment": "good",
             "freshness": "fresh",
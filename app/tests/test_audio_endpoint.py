@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils.audio_store import AudioStore
+
+FILENAME = "ab" * 32 + ".mp3"
+AUDIO = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = AudioStore(str(tmp_path), max_bytes=10 ** 6)
+    with open(tmp_path / FILENAME, "wb") as f:
+        f.write(AUDIO)
+    store.add(FILENAME, len(AUDIO))
+    monkeypatch.setattr(main, "audio_store", store)
+    # Without the context manager the lifespan (database, seeding) does not run
+    return TestClient(main.app)
+
+
+def test_get_serves_file_with_etag(client):
+    response = client.get(f"/audio/{FILENAME}")
+    assert response.status_code == 200
+    assert response.content == AUDIO
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["etag"].startswith('"abababab')
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get(f"/audio/{FILENAME}").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(f"/audio/{FILENAME}", headers={"If-None-Match": header})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get(f"/audio/{FILENAME}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_range_and_if_range(client):
+    etag = client.get(f"/audio/{FILENAME}").headers["etag"]
+
+    response = client.get(f"/audio/{FILENAME}", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == AUDIO[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(AUDIO)}"
+
+    resumed = client.get(f"/audio/{FILENAME}", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert resumed.status_code == 206
+    assert resumed.content == AUDIO[1000:]
+
+    # A stale validator gets the whole file instead of a splice of two versions
+    stale = client.get(f"/audio/{FILENAME}", headers={"Range": "bytes=1000-", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == AUDIO
+
+
+def test_head_returns_headers_only(client):
+    response = client.head(f"/audio/{FILENAME}")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(AUDIO))
+    assert "etag" in response.headers
+
+
+@pytest.mark.parametrize("name", [
+    "..%2F..%2Fapp%2Fmain.py",
+    "..%2F" + FILENAME,
+    FILENAME.replace(".mp3", ".wav"),
+    "cd" * 32 + ".mp3",  # well-formed but not stored
+])
+def test_unknown_or_traversal_names_are_404(client, name):
+    # Encoded slashes may be refused by the router or by AudioStore.path(); either way nothing is read
+    response = client.get(f"/audio/{name}")
+    assert response.status_code == 404
+    assert b"import" not in response.content
+
+
+def test_evicted_file_is_404(client, tmp_path):
+    os.remove(tmp_path / FILENAME)
+    assert client.get(f"/audio/{FILENAME}").status_code == 404
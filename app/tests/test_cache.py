@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from app.utils import cache as cache_module
+from app.utils.cache import SQLiteCacheBackend, TTLCache
+
+
+def _rows(backend: SQLiteCacheBackend):
+    backend._writer.submit(lambda: None).result()
+    with backend._lock:
+        return [row[0] for row in backend._conn.execute("SELECT key FROM cache ORDER BY key")]
+
+
+def test_set_purges_rows_past_stale_window(tmp_path, monkeypatch):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    backend.set("old", time.time() - 100, 1)
+    backend.set("stale", time.time() - 5, 2)
+    cache = TTLCache(ttl=60, backend=backend, stale_ttl=30)
+
+    cache.set("fresh", 3)
+    assert _rows(backend) == ["fresh", "stale"]
+
+    # Not purged again until the interval has passed
+    backend.set("old", time.time() - 100, 1)
+    cache.set("fresh", 4)
+    assert _rows(backend) == ["fresh", "old", "stale"]
+    monkeypatch.setattr(cache_module, "BACKEND_PURGE_INTERVAL", 0)
+    cache.set("fresh", 5)
+    assert _rows(backend) == ["fresh", "stale"]
+
+
+def test_aget_reads_backend_after_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = TTLCache(ttl=60, backend=SQLiteCacheBackend(path))
+    first.set("price", {"low": 1})
+    _rows(first.backend)
+
+    second = TTLCache(ttl=60, backend=SQLiteCacheBackend(path))
+    assert asyncio.run(second.aget("price")) == {"low": 1}
+    assert asyncio.run(second.aget("missing", "default")) == "default"
+    assert second.stats()["hits"] == 1
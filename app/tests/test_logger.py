@@ -0,0 +1,60 @@
+import logging
+import threading
+
+import pytest
+
+from app.core import logger as logger_module
+from app.core.logger import get_logger, setup_logging, shutdown_logging
+
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.threads = []
+
+    def emit(self, record):
+        self.threads.append(threading.current_thread().name)
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    """Route app logging to a Recorder, then put the stdout output back"""
+    original = logger_module._output_handler
+    recorder = Recorder()
+    monkeypatch.setattr(logger_module, "_output_handler", lambda: recorder)
+    shutdown_logging()
+    setup_logging()
+    yield recorder
+    shutdown_logging()
+    monkeypatch.setattr(logger_module, "_output_handler", original)
+    setup_logging()
+
+
+def test_records_are_formatted_on_the_listener_thread(monkeypatch, recorder):
+    formatted_on = []
+    original = logger_module.DroppingQueueHandler.format
+    monkeypatch.setattr(logger_module.DroppingQueueHandler, "format",
+                        lambda self, record: formatted_on.append(threading.current_thread()) or original(self, record))
+
+    get_logger("test").warning("value %s", 42)
+    shutdown_logging()
+
+    assert formatted_on == []
+    assert recorder.lines == ["value 42"]
+    assert threading.current_thread().name not in recorder.threads
+
+
+def test_logging_survives_shutdown_and_second_setup(recorder):
+    setup_logging()  # idempotent while active
+    log = get_logger("test")
+
+    shutdown_logging()
+    log.warning("between lifespans")
+    setup_logging()
+    log.warning("second lifespan")
+    shutdown_logging()
+    shutdown_logging()
+
+    assert recorder.lines == ["between lifespans", "second lifespan"]
@@ -0,0 +1,135 @@
+import asyncio
+import random
+import time
+
+from app.agents import matchmaker
+from app.agents.matchmaker import BuyerIndex, normalize_fish_type, rank_buyers, score_buyer
+from app.utils.geo import KNOWN_LOCATIONS, normalize_place, resolve_location
+
+
+def offer_args(location, fish_type, quantity_kg=100.0):
+    resolved = resolve_location(location)
+    return (normalize_place(location), resolved[:2] if resolved else None, resolved[2] if resolved else None,
+            normalize_fish_type(fish_type), quantity_kg)
+
+
+def brute_force_scores(index, args, top_k):
+    scores = sorted((score_buyer(buyer, *args)["score"] for buyer in index.buyers.values()), reverse=True)
+    return scores[:top_k]
+
+
+def test_general_buyer_outside_region_is_not_pruned():
+    index = BuyerIndex()
+    for i in range(3):
+        index.add({"id": f"perch-{i}", "location": "Mwanza", "preferred_fish_types": ["nile perch"]})
+    index.add({"id": "general", "location": "Tabora", "preferred_fish_types": []})
+
+    args = offer_args("Mwanza", "tilapia")
+    best = rank_buyers(index, *args, exclude_id=None, top_k=3)
+    assert best[0][1].id == "general"
+    assert [result["score"] for result, _ in best] == brute_force_scores(index, args, 3)
+
+
+def test_nearby_buyer_in_another_region_is_not_pruned():
+    index = BuyerIndex()
+    for i in range(3):
+        index.add({"id": f"far-{i}", "location": "Kigoma", "preferred_fish_types": ["tilapia"]})
+    # Shinyanga is lake_victoria, Tabora is central; close, but a different region and species
+    index.add({"id": "near", "location": "Tabora", "capacity_kg": 500, "preferred_fish_types": ["sardine"]})
+
+    args = offer_args("Shinyanga", "tilapia")
+    best = rank_buyers(index, *args, exclude_id=None, top_k=3)
+    assert [result["score"] for result, _ in best] == brute_force_scores(index, args, 3)
+
+
+def test_ranking_matches_scoring_every_buyer():
+    rng = random.Random(7)
+    places = list(KNOWN_LOCATIONS) + ["Unknown landing", "kijiji"]
+    species = ["tilapia", "nile perch", "sardine", "octopus"]
+    index = BuyerIndex()
+    for i in range(300):
+        index.add({
+            "id": f"buyer-{i}",
+            "location": rng.choice(places),
+            "preferred_fish_types": rng.sample(species, rng.randint(0, 2)),
+            "capacity_kg": rng.choice([None, 20, 80, 500]),
+        }, transactions=rng.randint(0, 30))
+
+    for _ in range(50):
+        args = offer_args(rng.choice(places), rng.choice(species), rng.choice([10.0, 100.0]))
+        for top_k in (1, 5, 10):
+            best = rank_buyers(index, *args, exclude_id=None, top_k=top_k)
+            assert [result["score"] for result, _ in best] == brute_force_scores(index, args, top_k)
+
+
+def test_offer_owner_is_excluded():
+    index = BuyerIndex()
+    index.add({"id": "me", "location": "Mwanza", "preferred_fish_types": ["tilapia"]})
+    index.add({"id": "other", "location": "Mwanza", "preferred_fish_types": ["tilapia"]})
+    best = rank_buyers(index, *offer_args("Mwanza", "tilapia"), exclude_id="me", top_k=5)
+    assert [buyer.id for _, buyer in best] == ["other"]
+
+
+def test_scored_candidates_stay_bounded_as_buyers_grow(monkeypatch):
+    places = list(KNOWN_LOCATIONS) + ["Unknown landing"]
+    species = ["tilapia", "dagaa", "nile perch", "sardine"]
+
+    def scored(buyer_count):
+        rng = random.Random(1)
+        index = BuyerIndex()
+        for i in range(buyer_count):
+            index.add({
+                "id": f"buyer-{i}",
+                "location": rng.choice(places),
+                "preferred_fish_types": rng.sample(species, rng.randint(0, 2)),
+                "capacity_kg": rng.choice([None, 50, 500]),
+            }, transactions=rng.randint(0, 30))
+        calls = []
+
+        def counting_score(*args):
+            calls.append(args[0].id)
+            return score_buyer(*args)
+
+        monkeypatch.setattr(matchmaker, "score_buyer", counting_score)
+        for location in ("Mwanza", "Dar es Salaam", "Unknown landing"):
+            for fish_type in ("tilapia", "dagaa"):
+                rank_buyers(index, *offer_args(location, fish_type), exclude_id=None, top_k=10)
+        return len(calls)
+
+    small, large = scored(500), scored(8000)
+    # 16x the buyers, yet common species still score only a few dozen candidates per offer
+    assert large < 2 * small
+    assert large < 6 * 60
+
+
+def test_numpy_and_fallback_batch_paths_agree(monkeypatch):
+    rng = random.Random(8)
+    places = list(KNOWN_LOCATIONS) + ["Unknown landing"]
+    species = ["tilapia", "nile perch", "sardine"]
+    index = BuyerIndex()
+    for i in range(60):
+        index.add({
+            "id": f"buyer-{i}",
+            "location": rng.choice(places),
+            "preferred_fish_types": rng.sample(species, rng.randint(0, 2)),
+            "capacity_kg": rng.choice([None, 20, 500]),
+        }, transactions=rng.randint(0, 30))
+    index.built_at = time.monotonic()
+    monkeypatch.setattr(matchmaker, "buyer_index", index)
+
+    # Some sellers are also buyers; their own listing must not cost them a match
+    offers = [{"fish_type": rng.choice(species), "quantity_kg": rng.choice([10, 100]), "location": rng.choice(places),
+               "user_id": f"buyer-{rng.randint(0, 59)}" if i % 2 else None} for i in range(20)]
+    price_analyses = [{"fair_price": 5000}] * len(offers)
+
+    def run_batch(top_k):
+        results = asyncio.run(matchmaker.find_matches_batch(offers, price_analyses, top_k=top_k))
+        return [[(match["buyer_id"], match["match_score"]) for match in matches] for matches in results]
+
+    for top_k in (1, 5, 60):
+        vectorized = run_batch(top_k)
+        monkeypatch.setattr(matchmaker, "NUMPY_AVAILABLE", False)
+        fallback = run_batch(top_k)
+        monkeypatch.setattr(matchmaker, "NUMPY_AVAILABLE", True)
+        assert vectorized == fallback
+        assert all(len(matches) == min(top_k, 60 - bool(offer["user_id"])) for offer, matches in zip(offers, vectorized))
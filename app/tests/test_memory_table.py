@@ -0,0 +1,80 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from app.core.database import MEMORY_TABLES, MemoryTable
+
+
+def make_catches(count=500, seed=3):
+    rng = random.Random(seed)
+    columns, indexed, json_columns = MEMORY_TABLES["catches"]
+    table = MemoryTable("catches", columns, indexed, json_columns)
+    start = datetime(2025, 1, 1)
+    for i in range(count):
+        # mostly in order, with some late arrivals and equal timestamps
+        created_at = start + timedelta(minutes=i - rng.choice([0, 0, 0, 30]))
+        table.insert({"id": f"c{i:04d}", "user_id": rng.choice(["u1", "u2", "u3"]),
+                      "fish_type": rng.choice(["tilapia", "sardine"]), "created_at": created_at})
+    return table
+
+
+def expected(table, conditions, before=None):
+    created_pos, id_pos = table.positions["created_at"], table.positions["id"]
+    rows = [row for row in table.rows.values()
+            if all(row[table.positions[column]] in (value if isinstance(value, list) else [value])
+                   for column, value in conditions)]
+    rows.sort(key=lambda row: (row[created_pos], row[id_pos]), reverse=True)
+    if before is not None:
+        rows = [row for row in rows if (row[created_pos], row[id_pos]) < before]
+    return [row[id_pos] for row in rows]
+
+
+def scanned(table, conditions, before=None):
+    return [row[table.positions["id"]] for row in table.scan_newest_first(conditions, before)]
+
+
+def test_filtered_scan_is_newest_first():
+    table = make_catches()
+    for conditions in ([], [("user_id", "u1")], [("user_id", ["u1", "u3"])],
+                       [("user_id", "u2"), ("fish_type", "tilapia")], [("fish_type", "sardine")],
+                       [("user_id", "nobody")]):
+        assert scanned(table, conditions) == expected(table, conditions)
+
+
+def test_keyset_pages_cover_every_row_once():
+    table = make_catches()
+    created_pos, id_pos = table.positions["created_at"], table.positions["id"]
+    conditions = [("user_id", "u2")]
+    seen, before = [], None
+    while True:
+        page = [row for _, row in zip(range(25), table.scan_newest_first(conditions, before))]
+        if not page:
+            break
+        seen.extend(row[id_pos] for row in page)
+        before = (page[-1][created_pos], page[-1][id_pos])
+    assert seen == expected(table, conditions)
+
+
+def test_stream_survives_out_of_order_inserts(monkeypatch):
+    from app.core import database
+    from app.core.database import MemoryDB
+
+    monkeypatch.setattr(database.settings, "DB_STREAM_BATCH_SIZE", 10)
+
+    async def scenario():
+        db = MemoryDB()
+        start = datetime(2025, 1, 1)
+        for i in range(100):
+            db.tables["catches"].insert({"id": f"c{i:03d}", "user_id": "u1", "created_at": start + timedelta(minutes=i)})
+        seen = []
+        async for row in db.iter_rows("catches", {"user_id": "u1"}):
+            seen.append(row["id"])
+            if len(seen) % 10 == 5:
+                # a late arrival older than everything streamed so far shifts the sorted index
+                db.tables["catches"].insert({"id": f"late{len(seen)}", "user_id": "u1",
+                                             "created_at": start - timedelta(minutes=len(seen))})
+        return seen
+
+    seen = asyncio.run(scenario())
+    assert len(seen) == len(set(seen))
+    assert [row_id for row_id in seen if row_id.startswith("c")] == [f"c{i:03d}" for i in range(99, -1, -1)]
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.core import security
+from app.core.security import CredentialsBusyError, PasswordHasher
+
+
+@pytest.fixture(autouse=True)
+def cheap_scrypt(monkeypatch):
+    # Keep the tests fast; the format and flow are the same at production cost
+    monkeypatch.setattr(security.settings, "SCRYPT_N", 1024)
+    monkeypatch.setattr(security.settings, "SCRYPT_R", 8)
+    monkeypatch.setattr(security.settings, "SCRYPT_P", 1)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def make_hasher(workers=2, queue_size=4):
+    return PasswordHasher(workers, queue_size)
+
+
+def test_hash_round_trip():
+    hasher = make_hasher()
+    stored = run(hasher.hash("correct horse"))
+    assert stored.startswith("scrypt$1024$8$1$")
+    assert "correct horse" not in stored
+    assert run(hasher.verify("correct horse", stored)) == (True, False)
+    hasher.shutdown()
+
+
+def test_wrong_password_is_rejected():
+    hasher = make_hasher()
+    stored = run(hasher.hash("correct horse"))
+    assert run(hasher.verify("wrong horse", stored)) == (False, False)
+    hasher.shutdown()
+
+
+def test_hashes_are_salted():
+    hasher = make_hasher()
+    assert run(hasher.hash("same")) != run(hasher.hash("same"))
+    hasher.shutdown()
+
+
+def test_unknown_user_still_costs_a_hash():
+    hasher = make_hasher()
+    assert run(hasher.verify("anything", None)) == (False, False)
+    assert hasher.stats()["verified"] == 1
+    hasher.shutdown()
+
+
+def test_legacy_plaintext_verifies_and_needs_rehash():
+    hasher = make_hasher()
+    assert run(hasher.verify("Piuspe@9702", "Piuspe@9702")) == (True, True)
+    assert run(hasher.verify("wrong", "Piuspe@9702")) == (False, False)
+    hasher.shutdown()
+
+
+def test_outdated_parameters_need_rehash(monkeypatch):
+    hasher = make_hasher()
+    stored = run(hasher.hash("pw"))
+    monkeypatch.setattr(security.settings, "SCRYPT_N", 2048)
+    assert run(hasher.verify("pw", stored)) == (True, True)
+    assert run(hasher.verify("nope", stored)) == (False, False)
+    hasher.shutdown()
+
+
+def test_full_queue_fails_fast():
+    hasher = make_hasher(workers=1, queue_size=1)
+
+    async def scenario():
+        # two hashes fill the worker and its queue slot; the third is turned away
+        tasks = [asyncio.create_task(hasher.hash("pw")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(CredentialsBusyError):
+            await hasher.hash("pw")
+        return await asyncio.gather(*tasks)
+
+    assert len(run(scenario())) == 2
+    assert hasher.stats()["rejected"] == 1
+    hasher.shutdown()
+
+
+def test_login_returns_503_when_hash_queue_is_full(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        monkeypatch.setattr(security.password_hasher, "limit", 0)
+        response = client.post("/api/auth/login", json={"email": "buyer@samakicash.com", "password": "Piuspe@9702"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_concurrent_duplicate_registration_creates_one_user(monkeypatch):
+    from app.api import auth
+    from app.core.database import MemoryDB
+    from app.models import UserCreate
+
+    class RacyDB(MemoryDB):
+        async def fetch_user_by_email(self, email):
+            # let the other registrations reach their check before anyone inserts
+            await asyncio.sleep(0.01)
+            return await super().fetch_user_by_email(email)
+
+    db = RacyDB()
+
+    async def get_db():
+        return db
+
+    monkeypatch.setattr(auth, "get_db", get_db)
+
+    async def scenario():
+        user = UserCreate(email="twice@example.com", password="pw", user_type="fisher")
+        return await asyncio.gather(*(auth.register(user) for _ in range(3)))
+
+    results = run(scenario())
+    assert [r["status"] for r in results].count("success") == 1
+    assert [r for r in results if r["status"] == "error"] == [auth.DUPLICATE_USER_RESPONSE] * 2
+    assert len(db.tables["users"]) == 1
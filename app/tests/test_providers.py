@@ -0,0 +1,165 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import providers
+from app.core.providers import (BATCH, CLOSED, HALF_OPEN, INTERACTIVE, OPEN, CircuitOpenError, Provider,
+                                RateLimitedError, TokenBucket, request_priority)
+
+URL = "https://provider.example/v1/chat"
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(monkeypatch):
+    monkeypatch.setattr(providers.settings, "BREAKER_WINDOW_SECONDS", 60)
+    monkeypatch.setattr(providers.settings, "BREAKER_MIN_REQUESTS", 4)
+    monkeypatch.setattr(providers.settings, "BREAKER_ERROR_RATE", 0.5)
+    monkeypatch.setattr(providers.settings, "BREAKER_OPEN_SECONDS", 0.05)
+    monkeypatch.setattr(providers.settings, "BREAKER_HALF_OPEN_PROBES", 1)
+
+
+class Upstream:
+    """Answers with the queued status codes (the last one repeats) and counts the calls it saw"""
+    def __init__(self, monkeypatch, *statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        monkeypatch.setattr(providers, "get_http_client", lambda url: client)
+
+    def handle(self, request):
+        self.calls += 1
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, json={})
+
+
+def test_breaker_opens_fails_fast_probes_and_closes(monkeypatch):
+    upstream = Upstream(monkeypatch, 500, 500, 500, 500, 200)
+    provider = Provider("test")
+
+    async def scenario():
+        for _ in range(4):
+            await provider.post(URL)
+        assert provider.state == OPEN
+
+        # Open: no upstream call at all
+        with pytest.raises(CircuitOpenError):
+            await provider.post(URL)
+        assert upstream.calls == 4
+        assert provider.rejected == 1
+
+        # After the open period one probe goes through and closes the breaker
+        await asyncio.sleep(0.06)
+        response = await provider.post(URL)
+        assert response.status_code == 200
+        assert provider.state == CLOSED
+        assert upstream.calls == 5
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens(monkeypatch):
+    upstream = Upstream(monkeypatch, 503)
+    provider = Provider("test")
+
+    async def scenario():
+        for _ in range(4):
+            await provider.post(URL)
+        await asyncio.sleep(0.06)
+        await provider.post(URL)
+        assert provider.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            await provider.post(URL)
+        assert upstream.calls == 5
+
+    asyncio.run(scenario())
+
+
+def test_half_open_admits_one_probe_at_a_time():
+    provider = Provider("test")
+    provider.state, provider.opened_at = OPEN, 0.0
+    assert provider._admit()
+    assert provider.state == HALF_OPEN
+    assert not provider._admit()
+
+
+def test_client_errors_do_not_open_the_breaker_but_429_does(monkeypatch):
+    async def calls(provider, count):
+        for _ in range(count):
+            await provider.post(URL)
+        return provider.state
+
+    Upstream(monkeypatch, 404)
+    assert asyncio.run(calls(Provider("test"), 6)) == CLOSED
+    Upstream(monkeypatch, 429)
+    assert asyncio.run(calls(Provider("test"), 4)) == OPEN
+
+
+def test_timeout_follows_p95_within_bounds(monkeypatch):
+    monkeypatch.setattr(providers.settings, "ADAPTIVE_TIMEOUT_MIN_SAMPLES", 20)
+    monkeypatch.setattr(providers.settings, "ADAPTIVE_TIMEOUT_MULTIPLIER", 2.0)
+    monkeypatch.setattr(providers.settings, "ADAPTIVE_TIMEOUT_MIN", 0.5)
+    provider = Provider("test")
+    assert provider.timeout(10) == 10  # too few samples: the configured maximum
+
+    for i in range(20):
+        provider._record(True, 1.0 if i < 19 else 3.0)
+    assert provider.p95() == 1.0
+    assert provider.timeout(10) == 2.0
+    assert provider.timeout(1.5) == 1.5
+
+    fast = Provider("fast")
+    for _ in range(20):
+        fast._record(True, 0.01)
+    assert fast.timeout(10) == 0.5  # never below ADAPTIVE_TIMEOUT_MIN
+
+
+def test_bucket_admits_interactive_before_batch():
+    bucket = TokenBucket(rate=50, burst=1)
+    admitted = []
+
+    async def caller(name, priority):
+        await bucket.acquire(priority, max_wait=5)
+        admitted.append(name)
+
+    async def scenario():
+        await bucket.acquire(INTERACTIVE, max_wait=5)  # empties the bucket
+        # Batch callers queue first; interactive ones arriving later still go ahead of them
+        tasks = [asyncio.create_task(caller(f"batch-{i}", BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(caller(f"interactive-{i}", INTERACTIVE)) for i in range(2)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert admitted == ["interactive-0", "interactive-1", "batch-0", "batch-1", "batch-2"]
+
+
+def test_bucket_rejects_after_max_wait():
+    bucket = TokenBucket(rate=1, burst=1)
+
+    async def scenario():
+        await bucket.acquire(INTERACTIVE, max_wait=5)
+        with pytest.raises(RateLimitedError):
+            await bucket.acquire(INTERACTIVE, max_wait=0.05)
+
+    asyncio.run(scenario())
+    assert bucket.rejected == 1
+    assert bucket.stats()["queued"] == 0
+
+
+def test_provider_uses_request_priority_for_rate_limit_wait(monkeypatch):
+    Upstream(monkeypatch, 200)
+    monkeypatch.setattr(providers.settings, "RATE_LIMIT_MAX_WAIT", 0.05)
+    monkeypatch.setattr(providers.settings, "RATE_LIMIT_MAX_WAIT_BATCH", 5)
+    provider = Provider("test", rate=10, burst=1)
+
+    async def scenario():
+        await provider.post(URL)
+        with pytest.raises(RateLimitedError):
+            await provider.post(URL)  # interactive: gives up after 50 ms
+        request_priority.set(BATCH)
+        response = await provider.post(URL)  # batch: waits ~100 ms for the next token
+        return response.status_code
+
+    assert asyncio.run(scenario()) == 200
+    assert provider.state == CLOSED
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents.orchestrator import Stage, run_stages
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def constant(value, delay=0.0):
+    async def stage(_):
+        await asyncio.sleep(delay)
+        return value
+    return stage
+
+
+def test_dependency_listed_later_is_rejected():
+    stages = [
+        Stage("first", constant(1)),
+        Stage("summary", constant(2), deps=["price"]),
+        Stage("price", constant(3)),
+    ]
+    with pytest.raises(ValueError, match="summary"):
+        run(run_stages(stages))
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="missing"):
+        run(run_stages([Stage("a", constant(1), deps=["missing"])]))
+
+
+def test_independent_stages_run_concurrently():
+    stages = [Stage(name, constant(name, delay=0.1)) for name in ("price", "insights", "image", "credit")]
+    started = time.perf_counter()
+    results = run(run_stages(stages))
+    elapsed = time.perf_counter() - started
+    assert results == {name: name for name in ("price", "insights", "image", "credit")}
+    assert elapsed < 0.3  # four 100 ms stages, not 400 ms in sequence
+
+
+def test_dependents_get_their_inputs_after_deps_finish():
+    order = []
+
+    def recording(name, delay):
+        async def stage(inputs):
+            await asyncio.sleep(delay)
+            order.append(name)
+            return {"name": name, "inputs": inputs}
+        return stage
+
+    results = run(run_stages([
+        Stage("price", recording("price", 0.05)),
+        Stage("insights", recording("insights", 0.01)),
+        Stage("match", recording("match", 0), deps=["price", "insights"]),
+    ]))
+    assert order == ["insights", "price", "match"]
+    assert set(results["match"]["inputs"]) == {"price", "insights"}
+    assert results["match"]["inputs"]["price"]["name"] == "price"
+
+
+def test_timeout_uses_fallback_and_dependents_continue():
+    errors = []
+
+    def fallback(e):
+        errors.append(e)
+        return "fallback"
+
+    async def dependent(inputs):
+        return f"used {inputs['slow']}"
+
+    started = time.perf_counter()
+    results = run(run_stages([
+        Stage("slow", constant("late", delay=1.0), timeout=0.05, fallback=fallback),
+        Stage("next", dependent, deps=["slow"]),
+    ]))
+    assert time.perf_counter() - started < 0.5
+    assert results == {"slow": "fallback", "next": "used fallback"}
+    assert isinstance(errors[0], TimeoutError)
+    assert "slow" in str(errors[0])
+
+
+def test_failing_stage_uses_fallback():
+    async def broken(_):
+        raise RuntimeError("provider down")
+
+    results = run(run_stages([
+        Stage("broken", broken, fallback=lambda e: {"error": str(e)}),
+        Stage("ok", constant("fine")),
+    ]))
+    assert results == {"broken": {"error": "provider down"}, "ok": "fine"}
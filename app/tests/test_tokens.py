@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from app.core.security import InvalidTokenError, TokenAuthority
+
+
+def make_authority(**kwargs):
+    options = {"ttl": 3600, "cache_size": 16}
+    options.update(kwargs)
+    return TokenAuthority("test-secret", **options)
+
+
+def test_issued_token_verifies():
+    authority = make_authority()
+    token, claims = authority.issue("user-1", "fisher")
+    assert authority.verify(token)["sub"] == "user-1"
+    # second verification is served from the verified-token cache
+    assert authority.verify(token) == claims
+    assert authority.hits == 1
+
+
+def test_tampered_signature_is_rejected():
+    authority = make_authority()
+    token, _ = authority.issue("user-1", "fisher")
+    payload, _, signature = token.partition(".")
+    tampered = payload + "." + ("A" if signature[0] != "A" else "B") + signature[1:]
+    with pytest.raises(InvalidTokenError):
+        authority.verify(tampered)
+
+
+def test_tampered_payload_is_rejected():
+    authority = make_authority()
+    token, _ = authority.issue("user-1", "fisher")
+    other, _ = authority.issue("user-2", "superuser")
+    forged = other.partition(".")[0] + "." + token.partition(".")[2]
+    with pytest.raises(InvalidTokenError):
+        authority.verify(forged)
+
+
+def test_token_signed_with_another_key_is_rejected():
+    token, _ = TokenAuthority("other-secret", 3600, 16).issue("user-1", "fisher")
+    with pytest.raises(InvalidTokenError):
+        make_authority().verify(token)
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    authority = make_authority(ttl=60)
+    token, _ = authority.issue("user-1", "fisher")
+    authority.verify(token)
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    with pytest.raises(InvalidTokenError):
+        authority.verify(token)
+
+
+def test_revoked_token_is_rejected_even_when_cached():
+    authority = make_authority()
+    token, claims = authority.issue("user-1", "fisher")
+    authority.verify(token)
+    authority.revoke(claims)
+    with pytest.raises(InvalidTokenError):
+        authority.verify(token)
+    other, _ = authority.issue("user-1", "fisher")
+    assert authority.verify(other)["sub"] == "user-1"
+
+
+def test_verified_cache_is_bounded():
+    authority = make_authority(cache_size=2)
+    for i in range(5):
+        authority.verify(authority.issue(f"user-{i}", "fisher")[0])
+    assert authority.stats()["cached"] == 2
+
+
+def test_without_secret_tokens_are_disabled():
+    authority = TokenAuthority(None, 3600, 16)
+    assert not authority.enabled
+    with pytest.raises(RuntimeError):
+        authority.issue("user-1", "fisher")
+    token, _ = make_authority().issue("user-1", "fisher")
+    with pytest.raises(InvalidTokenError):
+        authority.verify(token)
+
+
+def test_debug_without_secret_uses_random_key():
+    authority = TokenAuthority(None, 3600, 16, allow_random_key=True)
+    token, _ = authority.issue("user-1", "fisher")
+    assert authority.verify(token)["sub"] == "user-1"
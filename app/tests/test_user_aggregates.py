@@ -0,0 +1,65 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from app.core.database import MemoryDB
+
+
+def _catches(count: int):
+    rng = random.Random(9)
+    start = datetime(2026, 1, 1)
+    for i in range(count):
+        yield {
+            "id": f"catch-{i}",
+            "user_id": rng.choice(["u1", "u2", "u3"]),
+            "fish_type": rng.choice(["tilapia", "sardine", "nile_perch", None]),
+            "quantity_kg": rng.randint(1, 50),
+            "location": "Mwanza",
+            "price_analysis": rng.choice([{"fair_price": rng.randint(2000, 9000)}, {"fair_price": "n/a"}, None]),
+            "created_at": start + timedelta(minutes=rng.randint(0, 10000)),
+        }
+
+
+def test_running_totals_match_database_aggregates():
+    async def run():
+        db = MemoryDB()
+        await db.insert_catches(list(_catches(200)))
+        for user_id in ("u1", "u2", "u3", "nobody"):
+            aggregates = await db.fetch_user_aggregates(user_id)
+            summary = await db.fetch_catch_summary(user_id)
+            species = await db.fetch_catch_counts_by_fish_type(user_id)
+            assert aggregates["catch_count"] == summary["catch_count"]
+            assert aggregates["total_quantity_kg"] == summary["total_quantity_kg"]
+            assert aggregates["price_count"] == summary["price_count"]
+            assert abs(aggregates["price_sum"] - summary["price_sum"]) < 1e-6
+            assert aggregates["last_activity"] == summary["last_activity"]
+            assert aggregates["species_counts"] == dict(species)
+            assert [count for _, count in species] == sorted((count for _, count in species), reverse=True)
+    asyncio.run(run())
+
+
+def test_rebuild_repairs_drifted_totals():
+    async def run():
+        db = MemoryDB()
+        await db.insert_catches(list(_catches(50)))
+        expected = await db.fetch_user_aggregates("u1")
+        db.user_aggregates["u1"]["catch_count"] = 0
+        db.user_aggregates["u1"]["species_counts"].clear()
+        assert await db.rebuild_user_aggregates("u1") == expected
+        assert await db.fetch_user_aggregates("u1") == expected
+    asyncio.run(run())
+
+
+def test_non_finite_and_boolean_prices_are_ignored():
+    async def run():
+        db = MemoryDB()
+        prices = [float("nan"), "nan", float("inf"), "Infinity", True, "1e3", " 7", 4000, "2500.5"]
+        await db.insert_catches([
+            {"id": f"c{i}", "user_id": "u1", "fish_type": "tilapia", "quantity_kg": 1, "location": "Mwanza",
+             "price_analysis": {"fair_price": price}, "created_at": datetime(2026, 1, 1) + timedelta(minutes=i)}
+            for i, price in enumerate(prices)
+        ])
+        aggregates = await db.fetch_user_aggregates("u1")
+        assert (aggregates["price_sum"], aggregates["price_count"]) == (6500.5, 2)
+        assert await db.rebuild_user_aggregates("u1") == aggregates
+    asyncio.run(run())
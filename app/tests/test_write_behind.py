@@ -0,0 +1,76 @@
+import asyncio
+
+from app.core.write_behind import WriteBehindQueue
+
+KNOWN_USERS = {"u1", "u2"}
+
+
+class FakeCatchStore:
+    """Writes batches atomically and rejects a whole batch on an unknown user, like the catches foreign key"""
+    def __init__(self, outage_calls=0):
+        self.rows = []
+        self.outage_calls = outage_calls
+        self.calls = 0
+
+    async def insert_catches(self, records):
+        self.calls += 1
+        if self.calls <= self.outage_calls:
+            raise ConnectionError("database unavailable")
+        unknown = [record["user_id"] for record in records if record["user_id"] not in KNOWN_USERS]
+        if unknown:
+            raise ValueError(f"unknown user_id {unknown[0]}")
+        self.rows.extend(records)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_batch_with_unknown_user_keeps_other_records():
+    store = FakeCatchStore()
+
+    async def scenario():
+        queue = WriteBehindQueue(store.insert_catches, max_batch=10, max_delay=0.05, max_queue=100, retries=0)
+        for i, user_id in enumerate(["u1", "ghost", "u2", "u1"]):
+            await queue.put({"id": i, "user_id": user_id})
+        await queue.close()
+        return queue
+
+    queue = run(scenario())
+    assert sorted(record["id"] for record in store.rows) == [0, 2, 3]
+    assert queue.dropped == 1
+    assert queue.written == 3
+
+
+def test_batches_are_flushed_together():
+    store = FakeCatchStore()
+
+    async def scenario():
+        queue = WriteBehindQueue(store.insert_catches, max_batch=5, max_delay=0.05, max_queue=100)
+        for i in range(12):
+            await queue.put({"id": i, "user_id": "u1"})
+        await queue.close()
+        return queue
+
+    queue = run(scenario())
+    assert len(store.rows) == 12
+    assert queue.batches == 3
+    assert queue.dropped == 0
+
+
+def test_outage_longer_than_retries_drops_nothing():
+    store = FakeCatchStore(outage_calls=6)
+
+    async def scenario():
+        queue = WriteBehindQueue(store.insert_catches, max_batch=10, max_delay=0.05, max_queue=100,
+                                 retries=1, max_backoff=0.01)
+        for i, user_id in enumerate(["u1", "u2", "ghost", "u1"]):
+            await queue.put({"id": i, "user_id": user_id})
+        await queue.close()
+        return queue
+
+    queue = run(scenario())
+    # the outage is retried until the database is back; only the bad record is dropped
+    assert sorted(record["id"] for record in store.rows) == [0, 1, 3]
+    assert queue.dropped == 1
+    assert store.calls > 6
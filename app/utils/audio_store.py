@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiofiles.os
+
+from app.core.logger import get_logger
+
+logger = get_logger("audio_store")
+
+_FILENAME = re.compile(r"^[0-9a-f]{64}\.mp3$")
+
+
+def audio_key(text: str, voice_id: str, model_id: str) -> str:
+    """Content address of a synthesized message: same text, voice and model give the same audio"""
+    return hashlib.sha256(f"{model_id}\0{voice_id}\0{text}".encode()).hexdigest()
+
+
+class AudioStore:
+    """
+    Content-addressed MP3 store with a total size limit.
+
+    Files are named `<sha256>.mp3`, so a message that was already
+    synthesized is served from disk instead of calling the TTS provider
+    again. When the directory grows past `max_bytes` the least recently
+    used files are deleted.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Index files left by a previous run, oldest access first"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and _FILENAME.match(entry.name):
+                stat = entry.stat()
+                entries.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+
+    def path(self, filename: str) -> Optional[str]:
+        """Absolute path of a stored file, or None for unknown or malformed names"""
+        if not _FILENAME.match(filename):
+            return None
+        with self._lock:
+            if filename not in self._files:
+                return None
+            self._files.move_to_end(filename)
+        return os.path.join(self.directory, filename)
+
+    def get(self, key: str, record_miss: bool = True) -> Optional[str]:
+        """
+        Filename for `key` if it was already synthesized.
+
+        Pass record_miss=False for a pre-check that is followed by a
+        counted lookup, so one synthesis is not counted as two misses.
+        """
+        filename = f"{key}.mp3"
+        with self._lock:
+            if filename in self._files:
+                self._files.move_to_end(filename)
+                self.hits += 1
+                return filename
+            if record_miss:
+                self.misses += 1
+        return None
+
+    def add(self, filename: str, size: int):
+        """Register a file that was written into the directory and evict down to the size limit"""
+        evicted = []
+        with self._lock:
+            self.total_bytes += size - self._files.get(filename, 0)
+            self._files[filename] = size
+            self._files.move_to_end(filename)
+            while self.total_bytes > self.max_bytes and len(self._files) > 1:
+                name, old_size = self._files.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+                evicted.append(name)
+        for name in evicted:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def temp_path(self, filename: str) -> str:
+        """Scratch path in the store directory; written files become visible through commit()"""
+        return os.path.join(self.directory, f".{filename}.{uuid.uuid4().hex[:8]}.tmp")
+
+    async def commit(self, tmp_path: str, filename: str, size: int) -> str:
+        """Atomically move a fully written temp file into place"""
+        await aiofiles.os.replace(tmp_path, os.path.join(self.directory, filename))
+        self.add(filename, size)
+        logger.debug("Audio stored", extra={"audio_file": filename, "size": size})
+        return filename
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AudioBroadcast:
+    """
+    Fan-out buffer for audio that is still being synthesized.
+
+    The producer publishes chunks as they arrive from the TTS provider;
+    any number of clients can subscribe at any time and receive every
+    chunk from the start, then block until more arrive or the producer
+    finishes.
+    """
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.filename: Optional[str] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._cond = asyncio.Condition()
+
+    async def publish(self, chunk: bytes):
+        async with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    async def finish(self, filename: Optional[str] = None, error: Optional[str] = None):
+        async with self._cond:
+            self.filename = filename
+            self.error = error
+            self.done = True
+            self._cond.notify_all()
+
+    async def ready(self):
+        """Wait for the first chunk (or the end of a stream that produced none)"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.chunks or self.done)
+
+    async def wait(self) -> str:
+        """Wait for the producer; returns the stored filename or the error code"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.done)
+        return self.filename or self.error
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        sent = 0
+        while True:
+            while sent < len(self.chunks):
+                yield self.chunks[sent]
+                sent += 1
+            if self.done:
+                return
+            async with self._cond:
+                await self._cond.wait_for(lambda: len(self.chunks) > sent or self.done)
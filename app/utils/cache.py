@@ -0,0 +1,197 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from app.core.logger import get_logger
+
+logger = get_logger("cache")
+
+
+# Seconds between purges of expired rows from a persistent backend
+BACKEND_PURGE_INTERVAL = 300
+
+
+class SQLiteCacheBackend:
+    """
+    Persistent key/value store for TTLCache, survives restarts and is shared by workers on one host.
+
+    Writes (set, delete, purge_expired) are queued to one writer thread
+    and return at once, so they never block the event loop. get() is a
+    synchronous read; async callers go through TTLCache.aget(), which runs
+    it in a worker thread.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+
+    def _execute(self, query: str, params: Tuple = ()):
+        with self._lock:
+            self._conn.execute(query, params)
+
+    def _submit(self, query: str, params: Tuple = ()) -> Future:
+        future = self._writer.submit(self._execute, query, params)
+        future.add_done_callback(_log_write_error)
+        return future
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key: str, expires_at: float, value: Any) -> Future:
+        return self._submit(
+            "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, expires_at, json.dumps(value)),
+        )
+
+    def delete(self, key: str) -> Future:
+        return self._submit("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self, before: Optional[float] = None) -> Future:
+        """Delete rows that expired before `before` (default now)"""
+        return self._submit("DELETE FROM cache WHERE expires_at <= ?", (time.time() if before is None else before,))
+
+
+def _log_write_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Cache backend write failed: %s", future.exception())
+
+
+class TTLCache:
+    """
+    In-process LRU cache with per-entry expiry.
+
+    When a backend is given, entries are written through to it and memory
+    misses are served from it, so warm entries survive a restart. Rows
+    past their stale window are purged from the backend every
+    BACKEND_PURGE_INTERVAL seconds. A memory miss with a backend reads it
+    synchronously in get() and get_stale(); async code should use aget().
+    With `stale_ttl`, expired entries are kept that much longer so
+    get_stale() can serve them while the caller refreshes the value.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, backend: Optional[SQLiteCacheBackend] = None,
+                 stale_ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._purged_at = 0.0
+
+    def _read_backend(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning("Cache backend read failed: %s", e)
+            return None
+
+    def _load(self, key: str, entry: Optional[Tuple[float, Any]], now: float):
+        if entry is not None and entry[0] + self.stale_ttl > now:
+            self._store(key, entry)
+
+    def _lookup(self, key: str, now: float, load: bool = True) -> Optional[Tuple[float, Any]]:
+        """Entry for `key` unless it is past its stale window"""
+        entry = self._data.get(key)
+        if entry is None and load and self.backend is not None:
+            entry = self._read_backend(key)
+            self._load(key, entry, now)
+        if entry is not None and entry[0] + self.stale_ttl <= now:
+            self._data.pop(key, None)
+            return None
+        return entry
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._get(key, default, load=True)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """get() for async callers; a backend read on a memory miss runs in a worker thread"""
+        if self.backend is not None and key not in self._data:
+            entry = await asyncio.to_thread(self._read_backend, key)
+            self._load(key, entry, time.time())
+        return self._get(key, default, load=False)
+
+    def _get(self, key: str, default: Any, load: bool) -> Any:
+        now = time.time()
+        entry = self._lookup(key, now, load)
+        if entry is None or entry[0] <= now:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """(value, fresh) for an entry that is live or within its stale window, else None"""
+        now = time.time()
+        entry = self._lookup(key, now)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if entry[0] > now:
+            self.hits += 1
+            return entry[1], True
+        self.stale_hits += 1
+        return entry[1], False
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._store(key, (expires_at, value))
+        if self.backend is not None:
+            try:
+                self.backend.set(key, expires_at, value)
+                if now - self._purged_at >= BACKEND_PURGE_INTERVAL:
+                    self._purged_at = now
+                    self.backend.purge_expired(now - self.stale_ttl)
+            except Exception as e:
+                logger.warning("Cache backend write failed: %s", e)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        self._data.clear()
+
+    def _store(self, key: str, entry: Tuple[float, Any]):
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "persistent": self.backend is not None,
+        }
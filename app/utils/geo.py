@@ -0,0 +1,69 @@
+import math
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Landing sites and market towns: (latitude, longitude, fishing region)
+KNOWN_LOCATIONS = {
+    "mwanza": (-2.5164, 32.9175, "lake_victoria"),
+    "musoma": (-1.5000, 33.8000, "lake_victoria"),
+    "bukoba": (-1.3317, 31.8122, "lake_victoria"),
+    "geita": (-2.8718, 32.2346, "lake_victoria"),
+    "ukerewe": (-2.0500, 33.0500, "lake_victoria"),
+    "shinyanga": (-3.6619, 33.4232, "lake_victoria"),
+    "kigoma": (-4.8769, 29.6267, "lake_tanganyika"),
+    "sumbawanga": (-7.9667, 31.6167, "lake_tanganyika"),
+    "kyela": (-9.5833, 33.8667, "lake_nyasa"),
+    "mbeya": (-8.9094, 33.4608, "lake_nyasa"),
+    "iringa": (-7.7700, 35.6900, "southern_highlands"),
+    "dar es salaam": (-6.7924, 39.2083, "coast"),
+    "bagamoyo": (-6.4333, 38.9000, "coast"),
+    "tanga": (-5.0689, 39.0988, "coast"),
+    "zanzibar": (-6.1659, 39.2026, "coast"),
+    "pemba": (-5.0319, 39.7756, "coast"),
+    "mafia": (-7.9167, 39.6667, "coast"),
+    "kilwa": (-8.9167, 39.5167, "coast"),
+    "lindi": (-9.9969, 39.7144, "coast"),
+    "mtwara": (-10.2736, 40.1828, "coast"),
+    "morogoro": (-6.8278, 37.6591, "central"),
+    "dodoma": (-6.1630, 35.7516, "central"),
+    "singida": (-4.8163, 34.7436, "central"),
+    "tabora": (-5.0162, 32.8266, "central"),
+    "arusha": (-3.3869, 36.6830, "northern"),
+    "moshi": (-3.3348, 37.3404, "northern"),
+}
+
+LOCATION_ALIASES = {
+    "dar": "dar es salaam",
+    "dsm": "dar es salaam",
+    "unguja": "zanzibar",
+}
+
+
+def normalize_place(name: Optional[str]) -> str:
+    return " ".join(str(name or "").lower().replace(",", " ").split())
+
+
+@lru_cache(maxsize=4096)
+def resolve_location(name: Optional[str]) -> Optional[Tuple[float, float, str]]:
+    """Resolve a free-text location ("Mwanza, Kirumba market") to (lat, lon, region)"""
+    place = normalize_place(name)
+    if not place:
+        return None
+    place = LOCATION_ALIASES.get(place, place)
+    if place in KNOWN_LOCATIONS:
+        return KNOWN_LOCATIONS[place]
+    words = set(place.split())
+    for alias, known in LOCATION_ALIASES.items():
+        if alias in words:
+            return KNOWN_LOCATIONS[known]
+    for known, coords in KNOWN_LOCATIONS.items():
+        if known in place:
+            return coords
+    return None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
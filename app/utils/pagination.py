@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor for the (created_at, id) key of the last row on a page"""
+    created_at = row["created_at"]
+    payload = [created_at.isoformat() if isinstance(created_at, datetime) else created_at, row["id"]]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[Any, Any]]:
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), row_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+async def _ndjson_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for row in rows:
+        yield (json.dumps(row, default=_json_default) + "\n").encode()
+
+
+async def list_response(conn, table: str, filters: Dict[str, Any], key: str, limit: Optional[int],
+                        cursor: Optional[str], format: str = "json",
+                        columns: Optional[Iterable[str]] = None, extra: Optional[Dict[str, Any]] = None):
+    """
+    Shared implementation of the list endpoints.
+
+    format=json returns one page (newest first) plus `next_cursor` when more
+    rows exist; format=ndjson streams every row after `cursor` as
+    newline-delimited JSON without materializing the result.
+    """
+    after = decode_cursor(cursor)
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_lines(conn.iter_rows(table, filters, after=after, columns=columns)),
+            media_type="application/x-ndjson"
+        )
+
+    limit = min(limit or settings.PAGE_SIZE_DEFAULT, settings.PAGE_SIZE_MAX)
+    rows = await conn.fetch_page(table, filters, limit + 1, after=after, columns=columns)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        **(extra or {}),
+        "count": len(rows),
+        key: rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
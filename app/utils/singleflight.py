@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Merge concurrent calls for the same key into one execution.
+
+    The first caller for a key starts `fn()` as a task; callers arriving
+    while it runs await the same task and share its result or exception.
+    Waiters are shielded, so a cancelled caller (client disconnect, stage
+    deadline) does not cancel the call the others are waiting on.
+    """
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def start(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start `fn` for `key` unless it is already running; returns the task either way"""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.shared += 1
+            return task
+        self.calls += 1
+        task = asyncio.create_task(fn())
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, fn))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._tasks), "calls": self.calls, "shared": self.shared}